@@ -1,47 +1,260 @@
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable, FrozenSet
+from collections import OrderedDict
 import os
+import asyncio
+import hashlib
+import random
+import threading
+import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-class DecisionEngine:
-    """AI-powered decision engine for analyzing issues and recommending fixes"""
 
-    def __init__(self, config: Dict[str, Any]):
-        self.config = config
-        self.provider = config.get('provider', 'anthropic')
-        self.model = config.get('model', 'claude-sonnet-4-5-20250929')
-        self.api_key = os.getenv('ANTHROPIC_API_KEY') or config.get('api_key')
+def _dumps(obj: Any) -> str:
+    """Serialize to compact JSON, via orjson when installed"""
+    if orjson:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError
+_loads = orjson.loads if orjson else json.loads
+
+
+# Async AI clients shared across DecisionEngine instances, keyed by
+# (provider, api_key, base_url), so each credential set gets one connection pool
+_CLIENT_CACHE: Dict[Tuple[str, str, str], Any] = {}
+_CLIENT_LOCK = threading.Lock()
+
+# Persistent event loop all AI calls run on. Monitoring cycles run in worker
+# threads, and the async clients keep their connection pools bound to the
+# loop they were first used on, so every call goes through this one.
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared AI event loop, starting its thread on first use"""
+    global _LOOP
+    with _CLIENT_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name='decision-engine', daemon=True).start()
+        return _LOOP
 
-        # Initialize AI client based on provider
-        if self.provider == 'anthropic':
+
+def _get_client(provider: str, api_key: Optional[str], base_url: Optional[str]):
+    """Return the cached async client for a provider, creating it if needed"""
+    key = (provider, api_key or '', base_url or '')
+    with _CLIENT_LOCK:
+        if key in _CLIENT_CACHE:
+            return _CLIENT_CACHE[key]
+
+        if provider == 'anthropic':
             try:
-                from anthropic import Anthropic
-                self.client = Anthropic(api_key=self.api_key)
+                from anthropic import AsyncAnthropic
+                client = AsyncAnthropic(api_key=api_key, base_url=base_url, max_retries=0)
             except ImportError:
                 raise ImportError("Please install anthropic: pip install anthropic")
-        elif self.provider == 'openai':
+        elif provider == 'openai':
             try:
-                from openai import OpenAI
-                self.client = OpenAI(api_key=self.api_key)
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
             except ImportError:
                 raise ImportError("Please install openai: pip install openai")
-        elif self.provider == 'ollama':
+        elif provider == 'ollama':
             try:
                 import ollama
-                self.client = ollama
+                client = ollama.AsyncClient(host=base_url)
             except ImportError:
                 raise ImportError("Please install ollama: pip install ollama")
         else:
-            raise ValueError(f"Unsupported AI provider: {self.provider}")
+            raise ValueError(f"Unsupported AI provider: {provider}")
+
+        _CLIENT_CACHE[key] = client
+        return client
+
+
+# HTTP statuses worth retrying: rate limiting and server-side failures
+TRANSIENT_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+
+def _is_transient(error: Exception) -> bool:
+    """Check if an AI provider error is likely to succeed on retry"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+
+    # SDK exceptions (anthropic/openai/ollama) expose the HTTP status
+    if getattr(error, 'status_code', None) in TRANSIENT_STATUS_CODES:
+        return True
+
+    # Connection and timeout errors from the SDKs carry no status code
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+# Static part of the analysis prompt. Kept identical across calls so it can be
+# served from the provider's prompt cache; per-cycle data goes after it.
+ANALYSIS_INSTRUCTIONS = """You are a system administrator AI agent analyzing server and network issues.
+
+Your task:
+1. Analyze each issue and determine its severity (critical, high, medium, low)
+2. Identify the root cause if possible
+3. Recommend specific remediation actions from the allowed actions list
+4. If the issue requires human intervention, set action to "alert_only"
+
+Respond with a JSON array of action objects. Each action should have:
+{
+  "issue": "description of the issue",
+  "severity": "critical|high|medium|low",
+  "root_cause": "identified or suspected root cause",
+  "action": "action to take from allowed list or alert_only",
+  "action_params": {},  // parameters for the action
+  "reasoning": "why this action is recommended"
+}
+
+Examples of actions:
+- restart_service: {"service": "nginx"}
+- kill_hung_process: {"pid": 1234}
+- clear_disk_space: {"path": "/var/log", "threshold_mb": 1000}
+- restart_container: {"container": "app"}
+- clear_cache: {"type": "system"}
+- remount: {"mount_config": {...}}
+- unmount_remount: {"mount_config": {...}}
+- enable_automation: {"entity_id": "automation.name", "instance": "Home Assistant", "friendly_name": "Automation Name"}
+- reload_integration: {"integration_id": "abc123", "instance": "Home Assistant", "title": "Integration Name"}
+
+IMPORTANT: For Home Assistant actions (enable_automation, reload_integration), you MUST copy the following fields from the issue data into action_params:
+- integration_id (from issue's integration_id field)
+- entity_id (from issue's entity_id field)
+- instance (from issue's instance field)
+- title or friendly_name (from issue's title or friendly_name field)"""
+
+
+class DecisionEngine:
+    """AI-powered decision engine for analyzing issues and recommending fixes"""
+
+    # Fields that identify what an issue is about; used to build cache keys
+    SIGNATURE_FIELDS = (
+        'metric', 'host', 'server', 'service', 'partition', 'mount', 'container',
+        'name', 'instance', 'entity_id', 'integration_id', 'interface', 'issue'
+    )
+
+    # Metrics that _fallback_analysis handles deterministically
+    FAST_METRICS = frozenset({'service_status', 'disk_usage', 'network_ping', 'web_endpoint', 'mount_status'})
+
+    def __init__(self, config: Dict[str, Any], notifier=None):
+        self.config = config
+        self.notifier = notifier
+        self.provider = config.get('provider', 'anthropic')
+        self.model = config.get('model', 'claude-sonnet-4-5-20250929')
+        self.api_key = os.getenv('ANTHROPIC_API_KEY') or config.get('api_key')
+
+        # Deterministic, short output - the response is a small JSON array
+        self.temperature = config.get('temperature', 0.0)
+        self.top_p = config.get('top_p', 1.0)
+        self.max_tokens = config.get('max_tokens', 1024)
+
+        # Resolve well-understood issues with rules instead of calling the AI
+        self.fast_path = config.get('fast_path', True)
+        self.fast_path_max_issues = config.get('fast_path_max_issues', 20)
+        self._rules_path = {}  # metric -> whether its last analysis came from rules rather than the AI
+
+        # Response cache: key -> (timestamp, actions), oldest first
+        self._resp_cache = OrderedDict()
+        self.cache_max = config.get('response_cache_size', 256)
+        self.cache_ttl = config.get('response_cache_ttl', 600)
+
+        # Retry transient provider errors before falling back to rules.
+        # SDK-level retries are disabled in _get_client so this is the only policy.
+        self.retry_attempts = config.get('retry_attempts', 3)
+        self.retry_base_delay = config.get('retry_base_delay', 0.5)
+
+        # Async AI client, shared with any other engine using the same credentials
+        self.base_url = config.get('base_url')
+        self.client = _get_client(self.provider, self.api_key, self.base_url)
+        self._loop = _get_loop()
+
+        # Anthropic Message Batches: queue analyses and submit them together
+        # on a timer. Results arrive late, so this is only for alert-only runs.
+        self.batch_mode = config.get('batch_mode', False) and self.provider == 'anthropic'
+        self.batch_interval = config.get('batch_interval', 3600)
+        self.batch_poll_interval = config.get('batch_poll_interval', 60)
+        self._batch_queue = []
+        self._batch_counter = 0
+        if self.batch_mode:
+            asyncio.run_coroutine_threadsafe(self._batch_flush_loop(), self._loop)
 
     def analyze_issues(self, monitoring_results: List[Dict[str, Any]], allowed_actions: List[str]) -> List[Dict[str, Any]]:
-        """Analyze monitoring results and recommend actions"""
+        """Analyze monitoring results and recommend actions (sync wrapper for async)"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.analyze_issues_async(monitoring_results, allowed_actions),
+            self._loop
+        )
+        return future.result()
 
-        # Filter for unhealthy results
-        issues = [r for r in monitoring_results if not r.get('healthy', True)]
+    async def analyze_issues_async(self, monitoring_results: List[Dict[str, Any]], allowed_actions: List[str]) -> List[Dict[str, Any]]:
+        """Analyze monitoring results, one concurrent AI call per issue category"""
 
-        if not issues:
-            return []
+        groups = self._group_issues(monitoring_results)
+        allowed = frozenset(allowed_actions)
+
+        results = await asyncio.gather(*[
+            self._analyze_group(group, allowed) for group in groups
+        ])
+
+        return [action for actions in results for action in actions]
+
+    def _group_issues(self, monitoring_results: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Filter unhealthy results and group them by metric"""
+        groups = {}
+        for result in monitoring_results:
+            if not result.get('healthy', True):
+                groups.setdefault(result.get('metric', 'unknown'), []).append(result)
+        return list(groups.values())
+
+    def _resolve_locally(self, issues: List[Dict[str, Any]], allowed_actions: FrozenSet[str]) -> Optional[List[Dict[str, Any]]]:
+        """Answer a category of issues from rules or the response cache, or None"""
+
+        # Rules cover every issue in this category - no need for the AI
+        if self.fast_path and len(issues) <= self.fast_path_max_issues and \
+                all(i.get('metric') in self.FAST_METRICS for i in issues):
+            actions = self._fallback_analysis(issues, allowed_actions)
+            if len(actions) == len(issues):
+                self._log_analysis_path(issues, True)
+                return actions
+
+        self._log_analysis_path(issues, False)
+
+        # Same issues as a recent cycle - reuse the previous answer
+        return self._cache_get(self._cache_key(issues, allowed_actions))
+
+    def _log_analysis_path(self, issues: List[Dict[str, Any]], by_rules: bool):
+        """Log each rule-based analysis at debug level, and at info when a metric switches between rules and the AI"""
+        if self.notifier is None:
+            return
+
+        metric = issues[0].get('metric', 'unknown')
+        previous = self._rules_path.get(metric)
+        self._rules_path[metric] = by_rules
+
+        if by_rules:
+            if previous is not True:
+                self.notifier.log_info("AI bypassed: rule-based analysis now handling %s issues", metric)
+            self.notifier.log_debug("AI bypassed: rule-based analysis resolved %d %s issue(s)", len(issues), metric)
+        elif previous is True:
+            self.notifier.log_info("AI analysis resumed for %s issues", metric)
+
+    async def _analyze_group(self, issues: List[Dict[str, Any]], allowed_actions: FrozenSet[str]) -> List[Dict[str, Any]]:
+        """Analyze one category of issues with the AI provider"""
+
+        local = self._resolve_locally(issues, allowed_actions)
+        if local is not None:
+            return local
+
+        cache_key = self._cache_key(issues, allowed_actions)
 
         # Create prompt for AI
         prompt = self._create_analysis_prompt(issues, allowed_actions)
@@ -49,16 +262,18 @@ class DecisionEngine:
         # Get AI response
         try:
             if self.provider == 'anthropic':
-                response = self._call_anthropic(prompt)
+                response = await self._call_with_retry(self._call_anthropic, prompt)
             elif self.provider == 'openai':
-                response = self._call_openai(prompt)
+                response = await self._call_with_retry(self._call_openai, prompt)
             elif self.provider == 'ollama':
-                response = self._call_ollama(prompt)
+                response = await self._call_with_retry(self._call_ollama, prompt)
             else:
                 return []
 
             # Parse AI response
             actions = self._parse_ai_response(response)
+            if actions:
+                self._cache_put(cache_key, actions)
             return actions
 
         except Exception as e:
@@ -66,77 +281,203 @@ class DecisionEngine:
             # Fallback to rule-based decisions
             return self._fallback_analysis(issues, allowed_actions)
 
-    def _create_analysis_prompt(self, issues: List[Dict[str, Any]], allowed_actions: List[str]) -> str:
-        """Create the prompt for AI analysis"""
-        prompt = f"""You are a system administrator AI agent analyzing server and network issues.
+    def queue_analysis(self, monitoring_results: List[Dict[str, Any]], allowed_actions: List[str],
+                       callback: Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None]) -> List[Dict[str, Any]]:
+        """Queue issues for the next batch, results go to callback(issues, actions) (sync wrapper for async)"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.queue_analysis_async(monitoring_results, allowed_actions, callback),
+            self._loop
+        )
+        return future.result()
+
+    async def queue_analysis_async(self, monitoring_results: List[Dict[str, Any]], allowed_actions: List[str],
+                                   callback: Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], None]) -> List[Dict[str, Any]]:
+        """Queue issues for the next batch, returning actions resolved right away"""
+        immediate = []
+        allowed = frozenset(allowed_actions)
+
+        for issues in self._group_issues(monitoring_results):
+            local = self._resolve_locally(issues, allowed)
+            if local is not None:
+                immediate.extend(local)
+                continue
+
+            self._batch_counter += 1
+            self._batch_queue.append({
+                'custom_id': f'analysis-{self._batch_counter}',
+                'issues': issues,
+                'allowed_actions': allowed,
+                'callback': callback
+            })
+
+        return immediate
+
+    def flush_batch(self):
+        """Submit queued analyses now and wait for the results (sync wrapper for async)"""
+        asyncio.run_coroutine_threadsafe(self.flush_batch_async(), self._loop).result()
+
+    async def _batch_flush_loop(self):
+        """Submit the batch queue every batch_interval seconds"""
+        while True:
+            await asyncio.sleep(self.batch_interval)
+            try:
+                await self.flush_batch_async()
+            except Exception as e:
+                print(f"AI batch flush failed: {e}")
 
-MONITORING ISSUES DETECTED:
-{json.dumps(issues, indent=2)}
+    async def flush_batch_async(self):
+        """Submit queued analyses as one Message Batch and dispatch the results"""
+        if not self._batch_queue:
+            return
 
-ALLOWED REMEDIATION ACTIONS:
-{json.dumps(allowed_actions, indent=2)}
+        pending = {entry['custom_id']: entry for entry in self._batch_queue}
+        self._batch_queue = []
 
-Your task:
-1. Analyze each issue and determine its severity (critical, high, medium, low)
-2. Identify the root cause if possible
-3. Recommend specific remediation actions from the allowed actions list
-4. If the issue requires human intervention, set action to "alert_only"
+        try:
+            batch = await self.client.messages.batches.create(requests=[
+                {
+                    'custom_id': custom_id,
+                    'params': self._anthropic_params(
+                        self._create_analysis_prompt(entry['issues'], entry['allowed_actions'])
+                    )
+                }
+                for custom_id, entry in pending.items()
+            ])
+
+            while batch.processing_status != 'ended':
+                await asyncio.sleep(self.batch_poll_interval)
+                batch = await self.client.messages.batches.retrieve(batch.id)
+
+            async for result in await self.client.messages.batches.results(batch.id):
+                entry = pending.pop(result.custom_id, None)
+                if entry is None:
+                    continue
+
+                if result.result.type == 'succeeded':
+                    actions = self._parse_ai_response(result.result.message.content[0].text)
+                    if actions:
+                        self._cache_put(self._cache_key(entry['issues'], entry['allowed_actions']), actions)
+                else:
+                    print(f"AI batch request {result.custom_id} {result.result.type}")
+                    actions = self._fallback_analysis(entry['issues'], entry['allowed_actions'])
 
-Respond with a JSON array of action objects. Each action should have:
-{{
-  "issue": "description of the issue",
-  "severity": "critical|high|medium|low",
-  "root_cause": "identified or suspected root cause",
-  "action": "action to take from allowed list or alert_only",
-  "action_params": {{}},  // parameters for the action
-  "reasoning": "why this action is recommended"
-}}
+                await self._dispatch_batch_result(entry, actions)
 
-Examples of actions:
-- restart_service: {{"service": "nginx"}}
-- kill_hung_process: {{"pid": 1234}}
-- clear_disk_space: {{"path": "/var/log", "threshold_mb": 1000}}
-- restart_container: {{"container": "app"}}
-- clear_cache: {{"type": "system"}}
-- remount: {{"mount_config": {{...}}}}
-- unmount_remount: {{"mount_config": {{...}}}}
-- enable_automation: {{"entity_id": "automation.name", "url": "http://ha:8123", "token": "token", "friendly_name": "Automation Name"}}
-- reload_integration: {{"integration_id": "abc123", "url": "http://ha:8123", "token": "token", "title": "Integration Name"}}
+        except Exception as e:
+            print(f"AI batch analysis failed: {e}")
 
-IMPORTANT: For Home Assistant actions (enable_automation, reload_integration), you MUST copy the following fields from the issue data into action_params:
-- integration_id (from issue's integration_id field)
-- entity_id (from issue's entity_id field)
-- url (from issue's url field)
-- token (from issue's token field)
-- title or friendly_name (from issue's title or friendly_name field)
+        # Anything left unanswered falls back to rule-based decisions
+        for entry in pending.values():
+            await self._dispatch_batch_result(
+                entry, self._fallback_analysis(entry['issues'], entry['allowed_actions'])
+            )
+
+    async def _dispatch_batch_result(self, entry: Dict[str, Any], actions: List[Dict[str, Any]]):
+        """Hand batch actions to the caller's callback off the event loop"""
+        try:
+            await asyncio.to_thread(entry['callback'], entry['issues'], actions)
+        except Exception as e:
+            print(f"AI batch callback failed: {e}")
+
+    def _cache_key(self, issues: List[Dict[str, Any]], allowed_actions: FrozenSet[str]) -> str:
+        """Build a canonical hash of the issue signatures, allowed actions and model"""
+        signatures = []
+        for issue in issues:
+            value = issue.get('value')
+            if isinstance(value, (int, float)):
+                value = round(value)
+            signatures.append([str(issue.get(f)) for f in self.SIGNATURE_FIELDS] + [str(value)])
+
+        payload = _dumps([sorted(signatures), sorted(allowed_actions), self.provider, self.model])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached actions for key, or None if missing or expired"""
+        entry = self._resp_cache.get(key)
+        if entry is None:
+            return None
+
+        stored_at, actions = entry
+        if time.time() - stored_at > self.cache_ttl:
+            del self._resp_cache[key]
+            return None
+
+        self._resp_cache.move_to_end(key)
+        return actions
+
+    def _cache_put(self, key: str, actions: List[Dict[str, Any]]):
+        """Store actions for key, evicting the least recently used entries"""
+        self._resp_cache[key] = (time.time(), actions)
+        self._resp_cache.move_to_end(key)
+        while len(self._resp_cache) > self.cache_max:
+            self._resp_cache.popitem(last=False)
+
+    def _create_analysis_prompt(self, issues: List[Dict[str, Any]], allowed_actions: FrozenSet[str]) -> Tuple[str, str]:
+        """Create the prompt for AI analysis as (static_prefix, dynamic_part)"""
+        dynamic_part = f"""MONITORING ISSUES DETECTED:
+{_dumps(issues)}
+
+ALLOWED REMEDIATION ACTIONS:
+{_dumps(sorted(allowed_actions))}
 
 Respond ONLY with the JSON array, no other text."""
 
-        return prompt
+        return ANALYSIS_INSTRUCTIONS, dynamic_part
 
-    def _call_anthropic(self, prompt: str) -> str:
+    async def _call_with_retry(self, call, prompt: Tuple[str, str]) -> str:
+        """Run an AI call, retrying transient errors with exponential backoff"""
+        for attempt in range(self.retry_attempts):
+            try:
+                return await call(prompt)
+            except Exception as e:
+                if attempt == self.retry_attempts - 1 or not _is_transient(e):
+                    raise
+                delay = self.retry_base_delay * 2 ** attempt * (1 + random.random() * 0.1)
+                print(f"AI call failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _anthropic_params(self, prompt: Tuple[str, str]) -> Dict[str, Any]:
+        """Build Anthropic Messages API parameters for a prompt"""
+        static_prefix, dynamic_part = prompt
+        # Newer Claude models reject temperature and top_p together, so only temperature is sent
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    # Instructions never change between cycles, so let Anthropic cache them
+                    {"type": "text", "text": static_prefix, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": dynamic_part}
+                ]
+            }]
+        }
+
+    async def _call_anthropic(self, prompt: Tuple[str, str]) -> str:
         """Call Anthropic Claude API"""
-        message = self.client.messages.create(
-            model=self.model,
-            max_tokens=2000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        message = await self.client.messages.create(**self._anthropic_params(prompt))
         return message.content[0].text
 
-    def _call_openai(self, prompt: str) -> str:
+    async def _call_openai(self, prompt: Tuple[str, str]) -> str:
         """Call OpenAI API"""
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=2000
+            messages=[{"role": "user", "content": "\n\n".join(prompt)}],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            frequency_penalty=0,
+            presence_penalty=0
         )
         return response.choices[0].message.content
 
-    def _call_ollama(self, prompt: str) -> str:
+    async def _call_ollama(self, prompt: Tuple[str, str]) -> str:
         """Call Ollama local model"""
-        response = self.client.chat(
+        response = await self.client.chat(
             model=self.model,
-            messages=[{"role": "user", "content": prompt}]
+            messages=[{"role": "user", "content": "\n\n".join(prompt)}],
+            options={'temperature': self.temperature, 'top_p': self.top_p, 'num_predict': self.max_tokens}
         )
         return response['message']['content']
 
@@ -146,11 +487,12 @@ Respond ONLY with the JSON array, no other text."""
             # Extract JSON from response (handle markdown code blocks)
             response = response.strip()
             if response.startswith('```'):
-                # Remove markdown code block
-                lines = response.split('\n')
-                response = '\n'.join(lines[1:-1])
+                # Remove markdown code block fences without splitting every line
+                response = response.partition('\n')[2]
+                if response.endswith('```'):
+                    response = response[:-3]
 
-            actions = json.loads(response)
+            actions = _loads(response)
 
             # Validate structure
             if not isinstance(actions, list):
@@ -166,12 +508,13 @@ Respond ONLY with the JSON array, no other text."""
     def _fallback_analysis(self, issues: List[Dict[str, Any]], allowed_actions: List[str]) -> List[Dict[str, Any]]:
         """Fallback rule-based analysis when AI fails"""
         actions = []
+        allowed = frozenset(allowed_actions)  # no-op when already a frozenset
 
         for issue in issues:
             metric = issue.get('metric')
 
             # Service down - restart it
-            if metric == 'service_status' and 'restart_service' in allowed_actions:
+            if metric == 'service_status' and 'restart_service' in allowed:
                 actions.append({
                     'issue': issue.get('message'),
                     'severity': 'high',
@@ -182,7 +525,7 @@ Respond ONLY with the JSON array, no other text."""
                 })
 
             # High disk usage - clear space
-            elif metric == 'disk_usage' and issue.get('value', 0) > 90 and 'clear_disk_space' in allowed_actions:
+            elif metric == 'disk_usage' and issue.get('value', 0) > 90 and 'clear_disk_space' in allowed:
                 actions.append({
                     'issue': issue.get('message'),
                     'severity': 'high',
@@ -217,7 +560,7 @@ Respond ONLY with the JSON array, no other text."""
             # Mount issues
             elif metric == 'mount_status':
                 mount_issue = issue.get('issue')
-                if mount_issue == 'stale_mount' and 'remount' in allowed_actions:
+                if mount_issue == 'stale_mount' and 'remount' in allowed:
                     actions.append({
                         'issue': issue.get('message'),
                         'severity': 'high',
@@ -226,7 +569,7 @@ Respond ONLY with the JSON array, no other text."""
                         'action_params': {'mount_config': issue.get('config')},
                         'reasoning': 'Remount to recover stale NFS/network mount'
                     })
-                elif mount_issue == 'not_mounted' and 'unmount_remount' in allowed_actions:
+                elif mount_issue == 'not_mounted' and 'unmount_remount' in allowed:
                     actions.append({
                         'issue': issue.get('message'),
                         'severity': 'high',
@@ -1,4 +1,17 @@
-from .bot import HomelabBot
-from .agent_controller import AgentController
+import importlib
+
+# Imported on first access so runs without the bot never load discord.py
+_BOT_MODULES = {
+    'HomelabBot': '.bot',
+    'AgentController': '.agent_controller'
+}
+
+
+def __getattr__(name):
+    if name in _BOT_MODULES:
+        module = importlib.import_module(_BOT_MODULES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ['HomelabBot', 'AgentController']
@@ -3,6 +3,8 @@ Agent Controller - Interface between Discord bot and monitoring agent
 """
 from typing import Dict, List, Any
 from datetime import datetime
+from collections import deque
+from itertools import islice
 import asyncio
 
 
@@ -11,8 +13,11 @@ class AgentController:
 
     def __init__(self, agent_instance):
         self.agent = agent_instance
-        self.issues_history = []
         self.max_history = 100
+        self.issues_history = deque(maxlen=self.max_history)
+
+        # Serialize manual checks so !check spam can't pile up cycles
+        self._check_lock = asyncio.Lock()
 
     def add_to_history(self, issues: List[Dict], actions: List[Dict]):
         """Add issues and actions to history"""
@@ -23,14 +28,11 @@ class AgentController:
                 'actions': actions
             })
 
-            # Limit history size
-            self.issues_history = self.issues_history[-self.max_history:]
-
     async def get_status(self) -> Dict[str, Any]:
         """Get current homelab health status"""
         try:
             # Get current stats
-            stats = self.agent.daily_stats
+            stats = self.agent.daily_stats.as_dict()
 
             total_systems = stats.get('systems_total', 0)
             healthy_systems = stats.get('systems_healthy', 0)
@@ -39,16 +41,19 @@ class AgentController:
 
             is_healthy = total_systems > 0 and healthy_systems == total_systems
 
-            summary = f"**Homelab Health Status**\n\n"
-            summary += f"**Systems**: {healthy_systems}/{total_systems} healthy\n"
-            summary += f"**Today's Issues**: {issues_found}\n"
-            summary += f"**Auto-fixes**: {actions_taken}\n"
-            summary += f"**Monitoring Cycles**: {stats.get('total_checks', 0)}\n"
-
             if is_healthy:
-                summary += "\n✅ **All systems operational**"
+                health_line = "✅ **All systems operational**"
             else:
-                summary += f"\n⚠️ **{total_systems - healthy_systems} system(s) need attention**"
+                health_line = f"⚠️ **{total_systems - healthy_systems} system(s) need attention**"
+
+            summary = (
+                f"**Homelab Health Status**\n\n"
+                f"**Systems**: {healthy_systems}/{total_systems} healthy\n"
+                f"**Today's Issues**: {issues_found}\n"
+                f"**Auto-fixes**: {actions_taken}\n"
+                f"**Monitoring Cycles**: {stats.get('total_checks', 0)}\n"
+                f"\n{health_line}"
+            )
 
             return {
                 'healthy': is_healthy,
@@ -65,9 +70,11 @@ class AgentController:
     async def run_manual_check(self) -> Dict[str, Any]:
         """Trigger immediate monitoring cycle"""
         try:
-            # Run monitoring cycle in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self.agent.run_monitoring_cycle)
+            # Run monitoring cycle on the agent's cycle worker to avoid blocking
+            async with self._check_lock:
+                loop = asyncio.get_event_loop()
+                # Interactive check - skip batching so AI results come back immediately
+                await loop.run_in_executor(self.agent.cycle_executor, self.agent.run_monitoring_cycle, False)
 
             # Get recent issues
             recent = self.issues_history[-1] if self.issues_history else None
@@ -99,7 +106,8 @@ class AgentController:
 
     async def get_recent_issues(self, limit: int = 10) -> List[Dict]:
         """Get recent issues from history"""
-        return self.issues_history[-limit:]
+        start = max(0, len(self.issues_history) - limit)
+        return list(islice(self.issues_history, start, None))
 
     async def enable_autofix(self):
         """Enable automatic remediation"""
@@ -124,14 +124,14 @@ class HomelabBot(commands.Bot):
                     issues = entry.get('issues', [])
                     actions = entry.get('actions', [])
 
-                    # Format issues
-                    issues_text = "\n".join([
+                    # Format issues (limit per entry)
+                    issue_lines = [
                         f"  - {issue.get('metric', 'Unknown')}: {issue.get('message', 'No details')}"
-                        for issue in issues[:3]  # Limit per entry
-                    ])
-
+                        for issue in issues[:3]
+                    ]
                     if len(issues) > 3:
-                        issues_text += f"\n  ... and {len(issues) - 3} more"
+                        issue_lines.append(f"  ... and {len(issues) - 3} more")
+                    issues_text = "\n".join(issue_lines)
 
                     # Format actions
                     actions_text = f"\n**Actions**: {len(actions)} taken" if actions else ""
@@ -4,38 +4,82 @@ Network Monitor Agent - AI-powered system monitoring and remediation
 """
 
 import yaml
+import json
+import re
+import random
 import time
 import signal
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 import os
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-from monitors import (
-    SystemMonitor, NetworkMonitor, WebMonitor,
-    RemoteServerMonitor, ProxmoxMonitor, DockerRemoteMonitor,
-    HomeAssistantMonitor
-)
+import monitors
 from ai import DecisionEngine
 from remediation import RemediationActions
 from notifications import Notifier
-from discord_bot import HomelabBot, AgentController
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# Monitors in startup order: (config key, class name, enabled by default)
+MONITOR_SPEC = (
+    ('system', 'SystemMonitor', True),
+    ('network', 'NetworkMonitor', True),
+    ('web_services', 'WebMonitor', True),
+    ('remote_servers', 'RemoteServerMonitor', False),
+    ('proxmox', 'ProxmoxMonitor', False),
+    ('docker_remote', 'DockerRemoteMonitor', False),
+    ('home_assistant', 'HomeAssistantMonitor', False)
+)
+
+# KEY=value lines in .env files; comments and blank lines don't match.
+# [ \t] rather than \s so an empty value can't run into the next line.
+ENV_LINE_PATTERN = re.compile(r'^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t\r]*$', re.MULTILINE)
+
+# ${VAR} references in config values
+ENV_VAR_PATTERN = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+
+def _env_replace(match) -> str:
+    """Substitute one ${VAR} match, leaving unknown variables as-is"""
+    return os.environ.get(match.group(1), match.group(0))
 
 
 def load_env_file(env_path: str = '.env'):
     """Load environment variables from .env file"""
     if os.path.exists(env_path):
         with open(env_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip()
+            os.environ.update(ENV_LINE_PATTERN.findall(f.read()))
+
+
+# Seconds between daily summaries
+SUMMARY_INTERVAL = 86400
+
+
+class DailyStats:
+    """Counters reported in the daily summary"""
+
+    __slots__ = ('total_checks', 'issues_found', 'actions_taken', 'systems_healthy', 'systems_total')
+
+    def __init__(self, **counts):
+        for name in self.__slots__:
+            setattr(self, name, int(counts.get(name, 0)))
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return the counters as a plain dict"""
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 class NetworkMonitorAgent:
     """Main agent orchestrator"""
 
+    # Parsed config files: realpath -> ((mtime_ns, size), parsed YAML before env expansion)
+    _CONFIG_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
     def __init__(self, config_path: str = 'config.yaml'):
         # Load configuration
         self.config = self._load_config(config_path)
@@ -48,57 +92,56 @@ class NetworkMonitorAgent:
         monitoring_config = self.config.get('monitoring', {})
         self.monitors = []
 
-        if monitoring_config.get('system', {}).get('enabled', True):
-            self.monitors.append(SystemMonitor(monitoring_config.get('system', {})))
-
-        if monitoring_config.get('network', {}).get('enabled', True):
-            self.monitors.append(NetworkMonitor(monitoring_config.get('network', {})))
+        for key, class_name, enabled_by_default in MONITOR_SPEC:
+            monitor_config = monitoring_config.get(key, {})
+            if monitor_config.get('enabled', enabled_by_default):
+                # Resolved through the package so disabled monitors are never imported
+                monitor_class = getattr(monitors, class_name)
+                self.monitors.append(monitor_class(monitor_config))
 
-        if monitoring_config.get('web_services', {}).get('enabled', True):
-            self.monitors.append(WebMonitor(monitoring_config.get('web_services', {})))
-
-        if monitoring_config.get('remote_servers', {}).get('enabled', False):
-            self.monitors.append(RemoteServerMonitor(monitoring_config.get('remote_servers', {})))
-
-        if monitoring_config.get('proxmox', {}).get('enabled', False):
-            self.monitors.append(ProxmoxMonitor(monitoring_config.get('proxmox', {})))
-
-        if monitoring_config.get('docker_remote', {}).get('enabled', False):
-            self.monitors.append(DockerRemoteMonitor(monitoring_config.get('docker_remote', {})))
-
-        if monitoring_config.get('home_assistant', {}).get('enabled', False):
-            self.monitors.append(HomeAssistantMonitor(monitoring_config.get('home_assistant', {})))
+        # One worker per monitor, kept for the agent's lifetime so threads are
+        # reused across cycles instead of being created every time
+        self.monitor_executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.monitors)),
+            thread_name_prefix='monitor'
+        )
 
         # Log enabled monitors
         monitor_names = [m.__class__.__name__ for m in self.monitors]
         self.notifier.log_info(f"Enabled monitors: {', '.join(monitor_names)}")
 
         # Initialize AI decision engine
-        self.decision_engine = DecisionEngine(self.config.get('ai', {}))
+        self.decision_engine = DecisionEngine(self.config.get('ai', {}), notifier=self.notifier)
 
         # Initialize remediation
         remediation_config = self.config.get('remediation', {})
-        self.remediation = RemediationActions(remediation_config)
-
-        # Daily summary tracking
-        from datetime import datetime
-        self.last_summary = datetime.now()
-        self.daily_stats = {
-            'total_checks': 0,
-            'issues_found': 0,
-            'actions_taken': 0,
-            'systems_healthy': 0,
-            'systems_total': 0
-        }
+        self.remediation = RemediationActions(
+            remediation_config,
+            ha_instances=monitoring_config.get('home_assistant', {}).get('instances', [])
+        )
+
+        # Daily summary tracking, persisted so restarts don't reset the day
+        self.stats_file = os.path.expanduser(
+            monitoring_config.get('stats_file', '~/.network-monitor-agent-stats.json')
+        )
+        self._load_daily_stats()
         self.auto_fix = remediation_config.get('auto_fix', True)
         self.allowed_actions = remediation_config.get('allowed_actions', [])
 
         # Monitoring interval
         self.interval = monitoring_config.get('interval', 60)
 
+        # Max random delay (seconds) before each monitor starts on a scheduled
+        # cycle, so remote hosts aren't all polled at the same instant
+        self.jitter = monitoring_config.get('jitter', 0.1 * self.interval)
+
         # Running flag
         self.running = False
 
+        # Single worker for monitoring cycles, shared by the scheduled loop and
+        # Discord manual checks, so two cycles never run at the same time
+        self.cycle_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cycle')
+
         # Initialize Discord bot if enabled
         bot_config = self.config.get('discord_bot', {})
         self.bot_enabled = bot_config.get('enabled', False)
@@ -107,6 +150,7 @@ class NetworkMonitorAgent:
         if self.bot_enabled:
             bot_token = os.getenv('DISCORD_BOT_TOKEN')
             if bot_token:
+                from discord_bot import HomelabBot, AgentController
                 self.agent_controller = AgentController(self)
                 self.discord_bot = HomelabBot(
                     self.agent_controller,
@@ -124,8 +168,17 @@ class NetworkMonitorAgent:
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from YAML file"""
         try:
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            real_path = os.path.realpath(config_path)
+            stat = os.stat(real_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+
+            cached = self._CONFIG_CACHE.get(real_path)
+            if cached and cached[0] == signature:
+                config = cached[1]
+            else:
+                with open(real_path, 'r') as f:
+                    config = yaml.load(f, Loader=YamlLoader)
+                self._CONFIG_CACHE[real_path] = (signature, config)
 
             # Expand environment variables
             config = self._expand_env_vars(config)
@@ -139,14 +192,23 @@ class NetworkMonitorAgent:
             sys.exit(1)
 
     def _expand_env_vars(self, obj):
-        """Recursively expand environment variables in config"""
-        if isinstance(obj, dict):
-            return {k: self._expand_env_vars(v) for k, v in obj.items()}
+        """Recursively expand ${VAR} references in config, reusing unchanged nodes"""
+        if isinstance(obj, str):
+            if '${' not in obj:
+                return obj
+            return ENV_VAR_PATTERN.sub(_env_replace, obj)
+        elif isinstance(obj, dict):
+            changed = {}
+            for k, v in obj.items():
+                expanded = self._expand_env_vars(v)
+                if expanded is not v:
+                    changed[k] = expanded
+            return {**obj, **changed} if changed else obj
         elif isinstance(obj, list):
-            return [self._expand_env_vars(item) for item in obj]
-        elif isinstance(obj, str) and obj.startswith('${') and obj.endswith('}'):
-            env_var = obj[2:-1]
-            return os.getenv(env_var, obj)
+            expanded = [self._expand_env_vars(item) for item in obj]
+            if any(new is not old for new, old in zip(expanded, obj)):
+                return expanded
+            return obj
         else:
             return obj
 
@@ -155,44 +217,93 @@ class NetworkMonitorAgent:
         self.notifier.log_info(f"Received signal {signum}, shutting down...")
         self.running = False
 
-    def run_monitoring_cycle(self):
+    def _next_deadline(self, previous_deadline: float) -> float:
+        """Get the next cycle deadline, skipping ticks missed by a slow cycle"""
+        next_deadline = previous_deadline + self.interval
+        now = time.monotonic()
+        if next_deadline < now:
+            return now
+        return next_deadline
+
+    def _sleep_until(self, deadline: float):
+        """Sleep until a monotonic deadline, waking early if the agent stops"""
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, 1.0))
+
+    def _run_monitor(self, monitor, delay: float):
+        """Run one monitor's checks after an optional start delay"""
+        if delay > 0:
+            time.sleep(delay)
+        return monitor.run_checks()
+
+    def run_monitoring_cycle(self, use_batch: bool = True, stagger: bool = False):
         """Run one complete monitoring cycle"""
+        # Coalesce the cycle's webhook notifications into one post per channel
+        with self.notifier.batch():
+            self._run_monitoring_cycle(use_batch, stagger)
+
+    def _run_monitoring_cycle(self, use_batch: bool, stagger: bool):
+        """Run checks, analysis and remediation for one cycle"""
         self.notifier.log_info("=" * 60)
         self.notifier.log_info("Starting monitoring cycle")
 
         # Track daily stats
-        self.daily_stats['total_checks'] += 1
-
-        # Collect all monitoring results
-        all_results = []
-
-        for monitor in self.monitors:
+        self.daily_stats.total_checks += 1
+
+        # Monitors are IO-bound (ping, HTTP, SSH), so run them side by side.
+        # Results are collected in monitor order to keep output stable.
+        futures = [
+            (monitor, self.monitor_executor.submit(
+                self._run_monitor, monitor, random.uniform(0, self.jitter) if stagger else 0
+            ))
+            for monitor in self.monitors
+        ]
+
+        # Split unhealthy results and count healthy ones as each monitor's results arrive
+        issues = []
+        healthy = 0
+        total = 0
+        for monitor, future in futures:
             try:
-                results = monitor.run_checks()
-                all_results.extend(results)
+                results = future.result()
             except Exception as e:
                 self.notifier.log_error(f"Monitor {monitor.__class__.__name__} failed: {e}")
+                continue
 
-        # Filter unhealthy results
-        issues = [r for r in all_results if not r.get('healthy', True)]
+            total += len(results)
+            for result in results:
+                if result.get('healthy', True):
+                    healthy += 1
+                else:
+                    issues.append(result)
 
         # Track systems health
-        self.daily_stats['systems_total'] = len(all_results)
-        self.daily_stats['systems_healthy'] = len([r for r in all_results if r.get('healthy', True)])
+        self.daily_stats.systems_total = total
+        self.daily_stats.systems_healthy = healthy
 
         if not issues:
             self.notifier.notify_system_healthy()
             return
 
         # Track issues found
-        self.daily_stats['issues_found'] += len(issues)
+        self.daily_stats.issues_found += len(issues)
 
         # Report issues
         self.notifier.notify_issue_detected(issues)
 
         # Analyze with AI and get recommended actions
         try:
-            actions = self.decision_engine.analyze_issues(all_results, self.allowed_actions)
+            if use_batch and self.decision_engine.batch_mode and not self.auto_fix:
+                # Alert-only: defer AI analysis to the next batch, report what's resolved now
+                actions = self.decision_engine.queue_analysis(
+                    issues, self.allowed_actions, self._handle_batched_actions
+                )
+                self.notifier.log_info("Queued issues for batched AI analysis")
+            else:
+                actions = self.decision_engine.analyze_issues(issues, self.allowed_actions)
 
             if not actions:
                 self.notifier.log_warning("No actions recommended by AI")
@@ -221,7 +332,7 @@ class NetworkMonitorAgent:
 
                 # Track successful actions
                 if success:
-                    self.daily_stats['actions_taken'] += 1
+                    self.daily_stats.actions_taken += 1
                     executed_actions.append(action)
 
             # Add to bot history
@@ -235,37 +346,71 @@ class NetworkMonitorAgent:
                 self.agent_controller.add_to_history(issues, [])
             # Continue without AI - issues have been logged
 
+    def _handle_batched_actions(self, issues, actions):
+        """Report AI recommendations delivered by a finished batch"""
+        for action in actions:
+            severity = action.get('severity', 'unknown')
+            action_type = action.get('action', 'unknown')
+
+            self.notifier.log_info(f"AI Recommendation (batched): {action_type} (severity: {severity})")
+            self.notifier.log_info(f"  Reasoning: {action.get('reasoning', 'N/A')}")
+            self.notifier.notify_critical_issue(action)
+
+    def _load_daily_stats(self):
+        """Restore daily stats and the last summary time from the stats file"""
+        try:
+            with open(self.stats_file, 'r') as f:
+                saved = json.load(f)
+            self.daily_stats = DailyStats(**saved.get('stats', {}))
+            self.last_summary = float(saved.get('last_summary', time.time()))
+        except (OSError, ValueError, TypeError, AttributeError):
+            self.daily_stats = DailyStats()
+            self.last_summary = time.time()
+
+        # Summary deadline on the monotonic clock; wall time only crosses restarts
+        elapsed = max(0.0, time.time() - self.last_summary)
+        self.next_summary = time.monotonic() + max(0.0, SUMMARY_INTERVAL - elapsed)
+
+    def _save_daily_stats(self):
+        """Write daily stats and the last summary time to the stats file"""
+        try:
+            with open(self.stats_file, 'w') as f:
+                json.dump({'stats': self.daily_stats.as_dict(), 'last_summary': self.last_summary}, f)
+        except OSError as e:
+            self.notifier.log_warning(f"Could not save daily stats to {self.stats_file}: {e}")
+
+    def _check_daily_summary(self):
+        """Send the daily summary and reset counters once the day is up"""
+        if time.monotonic() < self.next_summary:
+            return
+
+        self.notifier.notify_daily_summary(self.daily_stats.as_dict())
+        self.daily_stats = DailyStats()
+        self.last_summary = time.time()
+        self.next_summary = time.monotonic() + SUMMARY_INTERVAL
+        self._save_daily_stats()
+
     async def _monitoring_loop(self):
         """Async monitoring loop that runs monitoring cycles"""
-        from datetime import datetime
         self.notifier.log_info(f"Network Monitor Agent running (interval: {self.interval}s)")
 
+        next_deadline = time.monotonic()
+
         try:
             while self.running:
                 try:
                     # Run monitoring cycle in thread pool to avoid blocking
                     loop = asyncio.get_event_loop()
-                    await loop.run_in_executor(None, self.run_monitoring_cycle)
+                    await loop.run_in_executor(self.cycle_executor, self.run_monitoring_cycle, True, True)
                 except Exception as e:
                     self.notifier.log_error(f"Error in monitoring cycle: {e}")
 
-                # Check if 24 hours passed for daily summary
-                time_since_summary = (datetime.now() - self.last_summary).total_seconds()
-                if time_since_summary >= 86400:  # 24 hours
-                    self.notifier.notify_daily_summary(self.daily_stats)
-                    self.last_summary = datetime.now()
-                    # Reset daily stats
-                    self.daily_stats = {
-                        'total_checks': 0,
-                        'issues_found': 0,
-                        'actions_taken': 0,
-                        'systems_healthy': 0,
-                        'systems_total': 0
-                    }
-
-                # Wait for next cycle
+                self._check_daily_summary()
+
+                # Wait for next cycle, measured from when this one was due
+                next_deadline = self._next_deadline(next_deadline)
                 if self.running:
-                    await asyncio.sleep(self.interval)
+                    await asyncio.sleep(max(0.0, next_deadline - time.monotonic()))
 
         except asyncio.CancelledError:
             pass
@@ -307,6 +452,9 @@ class NetworkMonitorAgent:
         finally:
             # Clean shutdown
             self.running = False
+            self.cycle_executor.shutdown(wait=False)
+            self.monitor_executor.shutdown(wait=False)
+            self._save_daily_stats()
 
             # Stop Discord bot
             if self.bot_enabled and self.discord_bot:
@@ -328,38 +476,29 @@ class NetworkMonitorAgent:
                 pass
         else:
             # Run synchronous mode if no bot
-            from datetime import datetime
             self.running = True
             self.notifier.log_info(f"Network Monitor Agent running (interval: {self.interval}s)")
 
+            next_deadline = time.monotonic()
+
             try:
                 while self.running:
                     try:
-                        self.run_monitoring_cycle()
+                        self.run_monitoring_cycle(stagger=True)
                     except Exception as e:
                         self.notifier.log_error(f"Error in monitoring cycle: {e}")
 
-                    # Check if 24 hours passed for daily summary
-                    time_since_summary = (datetime.now() - self.last_summary).total_seconds()
-                    if time_since_summary >= 86400:  # 24 hours
-                        self.notifier.notify_daily_summary(self.daily_stats)
-                        self.last_summary = datetime.now()
-                        # Reset daily stats
-                        self.daily_stats = {
-                            'total_checks': 0,
-                            'issues_found': 0,
-                            'actions_taken': 0,
-                            'systems_healthy': 0,
-                            'systems_total': 0
-                        }
-
-                    # Wait for next cycle
-                    if self.running:
-                        time.sleep(self.interval)
+                    self._check_daily_summary()
+
+                    # Wait for next cycle, measured from when this one was due
+                    next_deadline = self._next_deadline(next_deadline)
+                    self._sleep_until(next_deadline)
 
             except KeyboardInterrupt:
                 pass
             finally:
+                self.monitor_executor.shutdown(wait=False)
+                self._save_daily_stats()
                 self.notifier.notify_shutdown()
                 self.notifier.log_info("Agent stopped")
 
@@ -385,12 +524,19 @@ def main():
     # Load environment variables from .env file
     load_env_file()
 
+    # Use uvloop for the bot and AI event loops when it's installed
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     # Create agent
     agent = NetworkMonitorAgent(args.config)
 
     if args.test:
-        # Test mode - run once
-        agent.run_monitoring_cycle()
+        # Test mode - run once (no batching, the process exits right after)
+        agent.run_monitoring_cycle(use_batch=False)
     else:
         # Normal mode - run continuously
         agent.run()
@@ -1,10 +1,24 @@
-from .system_monitor import SystemMonitor
-from .network_monitor import NetworkMonitor
-from .web_monitor import WebMonitor
-from .remote_server_monitor import RemoteServerMonitor
-from .proxmox_monitor import ProxmoxMonitor
-from .docker_remote_monitor import DockerRemoteMonitor
-from .home_assistant_monitor import HomeAssistantMonitor
+import importlib
+
+# Monitor classes are imported on first access so disabled monitors don't
+# pay for their dependencies (docker SDK, etc.) at startup
+_MONITOR_MODULES = {
+    'SystemMonitor': '.system_monitor',
+    'NetworkMonitor': '.network_monitor',
+    'WebMonitor': '.web_monitor',
+    'RemoteServerMonitor': '.remote_server_monitor',
+    'ProxmoxMonitor': '.proxmox_monitor',
+    'DockerRemoteMonitor': '.docker_remote_monitor',
+    'HomeAssistantMonitor': '.home_assistant_monitor'
+}
+
+
+def __getattr__(name):
+    if name in _MONITOR_MODULES:
+        module = importlib.import_module(_MONITOR_MODULES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     'SystemMonitor',
@@ -0,0 +1,24 @@
+import socket
+import time
+
+# Seconds a successful lookup is reused; covers the checks within one monitoring cycle
+RESOLVE_TTL = 10
+
+_cache = {}  # host -> (expires, addrinfo)
+
+
+def resolve(host: str, port: int = 0) -> tuple:
+    """Resolve host to its first TCP (family, type, proto, canonname, sockaddr), shared across monitors"""
+    now = time.monotonic()
+
+    cached = _cache.get(host)
+    if cached and now < cached[0]:
+        addrinfo = cached[1]
+    else:
+        # Failures raise socket.gaierror and are not cached, so they are retried next time
+        addrinfo = socket.getaddrinfo(host, 0, type=socket.SOCK_STREAM)[0]
+        _cache[host] = (now + RESOLVE_TTL, addrinfo)
+
+    # One lookup per host serves every port; IPv6 sockaddrs keep their flowinfo/scope_id
+    family, type_, proto, canonname, sockaddr = addrinfo
+    return family, type_, proto, canonname, (sockaddr[0], port) + sockaddr[2:]
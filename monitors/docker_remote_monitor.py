@@ -1,6 +1,9 @@
 import docker
+import json
 import subprocess
 from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from .ssh_control import ssh_options
 
 
 class DockerRemoteMonitor:
@@ -9,14 +12,16 @@ class DockerRemoteMonitor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.hosts = config.get('hosts', [])
+        self._docker_client = None
+
+        # Reuse one SSH connection per host across cycles
+        self.ssh_options = ssh_options(config)
 
     def _ssh_docker_command(self, host: str, user: str, command: str) -> tuple:
         """Execute docker command on remote server via SSH"""
         try:
-            full_cmd = f'ssh -o ConnectTimeout=5 -o StrictHostKeyChecking=no {user}@{host} "docker {command}"'
             result = subprocess.run(
-                full_cmd,
-                shell=True,
+                ['ssh', *self.ssh_options, f'{user}@{host}', f'docker {command}'],
                 capture_output=True,
                 text=True,
                 timeout=15
@@ -25,22 +30,35 @@ class DockerRemoteMonitor:
         except Exception as e:
             return False, "", str(e)
 
+    def _get_docker_client(self):
+        """Get the cached low-level Docker API client"""
+        if self._docker_client is None:
+            self._docker_client = docker.from_env().api
+        return self._docker_client
+
+    def _parse_health(self, status_text: str):
+        """Extract healthcheck state from a 'docker ps' status like 'Up 2 hours (healthy)'"""
+        if '(healthy)' in status_text:
+            return 'healthy'
+        if '(unhealthy)' in status_text:
+            return 'unhealthy'
+        if '(health: starting)' in status_text:
+            return 'starting'
+        return None
+
     def check_local_docker(self) -> List[Dict[str, Any]]:
         """Check local Docker containers"""
         results = []
 
         try:
-            client = docker.from_env()
-            containers = client.containers.list(all=True)
+            # One /containers/json call; the list already carries state and health
+            containers = self._get_docker_client().containers(all=True)
 
             for container in containers:
-                name = container.name
-                status = container.status
-                health = None
-
-                # Check health if available
-                if container.attrs.get('State', {}).get('Health'):
-                    health = container.attrs['State']['Health']['Status']
+                names = container.get('Names') or [container.get('Id', '')[:12]]
+                name = names[0].lstrip('/')
+                status = container.get('State', 'unknown')
+                health = self._parse_health(container.get('Status', ''))
 
                 is_healthy = status == 'running'
                 if health:
@@ -57,6 +75,8 @@ class DockerRemoteMonitor:
                 })
 
         except Exception as e:
+            # Drop the client so the next cycle reconnects
+            self._docker_client = None
             results.append({
                 'metric': 'docker_container',
                 'host': 'local',
@@ -74,10 +94,10 @@ class DockerRemoteMonitor:
         user = host_config.get('user', 'root')
         name = host_config.get('name', host)
 
-        # Get container list
+        # Get container list, one JSON object per line
         success, stdout, stderr = self._ssh_docker_command(
             host, user,
-            "ps -a --format '{{.Names}}|{{.Status}}|{{.State}}'"
+            "ps -a --format '{{json .}}'"
         )
 
         if not success:
@@ -91,27 +111,30 @@ class DockerRemoteMonitor:
             return results
 
         # Parse container info
-        for line in stdout.strip().split('\n'):
-            if not line:
-                continue
-
-            parts = line.split('|')
-            if len(parts) >= 3:
-                container_name = parts[0]
-                status_text = parts[1]
-                state = parts[2]
-
-                is_healthy = state == 'running'
+        try:
+            containers = [json.loads(line) for line in stdout.splitlines() if line]
+        except ValueError as e:
+            results.append({
+                'metric': 'docker_remote',
+                'host': name,
+                'healthy': False,
+                'error': str(e),
+                'message': f'Failed to parse Docker output from {name}: {str(e)}'
+            })
+            return results
 
-                results.append({
-                    'metric': 'docker_container',
-                    'host': name,
-                    'container': container_name,
-                    'status': state,
-                    'status_text': status_text,
-                    'healthy': is_healthy,
-                    'message': f'{name}/{container_name}: {state}'
-                })
+        results.extend(
+            {
+                'metric': 'docker_container',
+                'host': name,
+                'container': container.get('Names'),
+                'status': container.get('State'),
+                'status_text': container.get('Status'),
+                'healthy': container.get('State') == 'running',
+                'message': f"{name}/{container.get('Names')}: {container.get('State')}"
+            }
+            for container in containers
+        )
 
         return results
 
@@ -120,10 +143,16 @@ class DockerRemoteMonitor:
         results = []
 
         # Check local Docker
-        results.extend(self.check_local_docker())
+        if not self.hosts:
+            return self.check_local_docker()
+
+        # Remote hosts are independent SSH round-trips, so query them alongside the local daemon
+        with ThreadPoolExecutor(max_workers=min(32, len(self.hosts)), thread_name_prefix='docker') as executor:
+            remote_results = executor.map(self.check_remote_docker, self.hosts)
+            results.extend(self.check_local_docker())
 
-        # Check remote Docker hosts
-        for host_config in self.hosts:
-            results.extend(self.check_remote_docker(host_config))
+            # Check remote Docker hosts
+            for host_results in remote_results:
+                results.extend(host_results)
 
         return results
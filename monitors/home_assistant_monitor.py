@@ -1,11 +1,20 @@
+import sys
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 # Disable SSL warnings for self-signed certificates
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Entity domains monitored when an instance doesn't set entity_domains
+DEFAULT_ENTITY_DOMAINS = ('light', 'switch', 'climate', 'binary_sensor', 'sensor', 'lock', 'cover')
+
+# Entity states reported as problems
+PROBLEM_STATES = frozenset({'unavailable', 'unknown'})
+
 
 class HomeAssistantMonitor:
     """Monitor Home Assistant automations, devices, and integrations"""
@@ -13,42 +22,53 @@ class HomeAssistantMonitor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.instances = config.get('instances', [])
+        self._sessions = {}  # Keep-alive session per instance URL
+
+        # Monitored entity domains per instance name, built once
+        self._domain_sets = {
+            instance.get('name', instance.get('url')): frozenset(instance.get('entity_domains', DEFAULT_ENTITY_DOMAINS))
+            for instance in self.instances
+        }
+
+    def _get_session(self, url: str, token: str) -> requests.Session:
+        """Get the persistent HTTP session for a Home Assistant instance"""
+        session = self._sessions.get(url)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/json'
+            })
+            session.verify = False
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._sessions[url] = session
+        return session
 
     def _api_get(self, url: str, token: str, endpoint: str) -> tuple:
         """Make GET request to Home Assistant API"""
         try:
             full_url = f"{url}/api/{endpoint}"
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-
-            response = requests.get(full_url, headers=headers, verify=False, timeout=10)
+            response = self._get_session(url, token).get(full_url, timeout=10)
 
             if response.status_code == 200:
                 return True, response.json()
             else:
-                return False, None
+                return False, f'HTTP {response.status_code}'
 
         except Exception as e:
-            return False, None
+            return False, str(e)
 
-    def check_automations(self, instance_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def check_automations(self, instance_config: Dict[str, Any], states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Check Home Assistant automations for issues"""
         results = []
         url = instance_config.get('url')
-        token = instance_config.get('token')
         name = instance_config.get('name', url)
 
         if not instance_config.get('check_automations', True):
             return results
 
-        # Get all automation states
-        success, states = self._api_get(url, token, 'states')
-
-        if not success:
-            return results
-
         # Filter to just automations
         automations = [s for s in states if s.get('entity_id', '').startswith('automation.')]
 
@@ -65,40 +85,32 @@ class HomeAssistantMonitor:
                     'instance': name,
                     'entity_id': entity_id,
                     'friendly_name': friendly_name,
-                    'state': state,
+                    'state': sys.intern(state),
                     'healthy': False,
                     'issue': 'disabled',
-                    'message': f'Automation "{friendly_name}" is disabled',
-                    'url': url,
-                    'token': token
+                    'message': f'Automation "{friendly_name}" is disabled'
                 })
 
         return results
 
-    def check_entities(self, instance_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def check_entities(self, instance_config: Dict[str, Any], states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Check Home Assistant entities for unavailable/unknown states"""
         results = []
         url = instance_config.get('url')
-        token = instance_config.get('token')
         name = instance_config.get('name', url)
-        entity_domains = instance_config.get('entity_domains', [
-            'light', 'switch', 'climate', 'binary_sensor', 'sensor', 'lock', 'cover'
-        ])
 
         if not instance_config.get('check_entities', True):
             return results
 
-        # Get all entity states
-        success, states = self._api_get(url, token, 'states')
-
-        if not success:
-            return results
-
-        # Filter to monitored domains
-        monitored_entities = [
-            s for s in states
-            if any(s.get('entity_id', '').startswith(f'{domain}.') for domain in entity_domains)
-        ]
+        # Filter to monitored domains (one split and set lookup per entity)
+        domain_set = self._domain_sets.get(name)
+        if domain_set is None:
+            domain_set = frozenset(instance_config.get('entity_domains', DEFAULT_ENTITY_DOMAINS))
+        monitored_entities = []
+        for s in states:
+            domain, sep, _ = s.get('entity_id', '').partition('.')
+            if sep and domain in domain_set:
+                monitored_entities.append(s)
 
         for entity in monitored_entities:
             entity_id = entity.get('entity_id')
@@ -108,25 +120,33 @@ class HomeAssistantMonitor:
             domain = entity_id.split('.')[0] if '.' in entity_id else 'unknown'
 
             # Check for problematic states
-            if state in ['unavailable', 'unknown']:
+            if state in PROBLEM_STATES:
                 results.append({
                     'metric': 'ha_entity',
                     'instance': name,
                     'entity_id': entity_id,
                     'friendly_name': friendly_name,
-                    'domain': domain,
-                    'state': state,
+                    'domain': sys.intern(domain),
+                    'state': sys.intern(state),
                     'healthy': False,
-                    'issue': f'{state}_state',
-                    'message': f'{domain.capitalize()} "{friendly_name}" is {state}',
-                    'url': url,
-                    'token': token
+                    'issue': sys.intern(f'{state}_state'),
+                    'message': f'{domain.capitalize()} "{friendly_name}" is {state}'
                 })
 
         return results
 
-    def check_integrations(self, instance_config: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Check Home Assistant integrations for failures"""
+    def _connection_failure(self, name: str, error: str) -> Dict[str, Any]:
+        """Build the result for a Home Assistant instance that couldn't be reached"""
+        return {
+            'metric': 'ha_connection',
+            'instance': name,
+            'healthy': False,
+            'error': error,
+            'message': f'Failed to connect to Home Assistant at {name}: {error}'
+        }
+
+    def check_integrations(self, instance_config: Dict[str, Any], first_request: bool = False) -> List[Dict[str, Any]]:
+        """Check Home Assistant integrations for failures (first_request: also report connection failures)"""
         results = []
         url = instance_config.get('url')
         token = instance_config.get('token')
@@ -141,7 +161,10 @@ class HomeAssistantMonitor:
 
         if not success:
             # Config entries endpoint might not be available or require different permissions
-            # This is optional, so we just skip if it fails
+            # (403/404), which is fine to skip; anything else on the first request means the
+            # instance itself is unreachable or rejecting the token
+            if first_request and entries not in ('HTTP 403', 'HTTP 404'):
+                results.append(self._connection_failure(name, entries))
             return results
 
         if isinstance(entries, list):
@@ -161,14 +184,12 @@ class HomeAssistantMonitor:
                         'metric': 'ha_integration',
                         'instance': name,
                         'integration_id': entry_id,
-                        'domain': domain,
+                        'domain': sys.intern(domain),
                         'title': title,
-                        'state': state,
+                        'state': sys.intern(state),
                         'healthy': False,
                         'issue': 'integration_failed',
-                        'message': f'Integration "{title}" ({domain}) is in state: {state}',
-                        'url': url,
-                        'token': token
+                        'message': f'Integration "{title}" ({domain}) is in state: {state}'
                     })
 
         return results
@@ -180,32 +201,27 @@ class HomeAssistantMonitor:
         token = instance_config.get('token')
         name = instance_config.get('name', url)
 
-        # Test basic connectivity first
-        try:
-            response = requests.get(f"{url}/api/", headers={'Authorization': f'Bearer {token}'}, verify=False, timeout=5)
-            if response.status_code != 200:
-                results.append({
-                    'metric': 'ha_connection',
-                    'instance': name,
-                    'healthy': False,
-                    'error': f'HTTP {response.status_code}',
-                    'message': f'Failed to connect to Home Assistant at {name}'
-                })
+        # Whichever request goes first doubles as the connectivity check
+        fetch_states = instance_config.get('check_automations', True) or instance_config.get('check_entities', True)
+        check_integrations = instance_config.get('check_integrations', True)
+
+        # Fetch entity states once; automations and entities both read from it
+        if fetch_states:
+            success, states = self._api_get(url, token, 'states')
+            if not success:
+                results.append(self._connection_failure(name, states))
                 return results
-        except Exception as e:
-            results.append({
-                'metric': 'ha_connection',
-                'instance': name,
-                'healthy': False,
-                'error': str(e),
-                'message': f'Failed to connect to Home Assistant at {name}: {str(e)}'
-            })
-            return results
 
-        # Run all checks
-        results.extend(self.check_automations(instance_config))
-        results.extend(self.check_entities(instance_config))
-        results.extend(self.check_integrations(instance_config))
+            results.extend(self.check_automations(instance_config, states))
+            results.extend(self.check_entities(instance_config, states))
+
+        if check_integrations:
+            results.extend(self.check_integrations(instance_config, first_request=not fetch_states))
+        elif not fetch_states:
+            # No checks enabled; still confirm the instance is reachable
+            success, error = self._api_get(url, token, '')
+            if not success:
+                results.append(self._connection_failure(name, error))
 
         return results
 
@@ -213,7 +229,14 @@ class HomeAssistantMonitor:
         """Run all Home Assistant checks"""
         results = []
 
-        for instance in self.instances:
-            results.extend(self.check_instance(instance))
+        if len(self.instances) <= 1:
+            for instance in self.instances:
+                results.extend(self.check_instance(instance))
+            return results
+
+        # Instances are independent and each has its own session, so query them in parallel
+        with ThreadPoolExecutor(max_workers=len(self.instances), thread_name_prefix='ha') as executor:
+            for instance_results in executor.map(self.check_instance, self.instances):
+                results.extend(instance_results)
 
         return results
@@ -1,6 +1,27 @@
 import subprocess
 import re
+import os
+import errno
+import selectors
+import socket
+import time
 from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from .result_cache import ttl_cache
+from . import dns_cache
+
+try:
+    import icmplib
+except ImportError:
+    icmplib = None
+
+# ping / ip output parsers, compiled once
+PACKET_LOSS_PATTERN = re.compile(r'(\d+)% packet loss')
+LATENCY_PATTERN = re.compile(r'rtt min/avg/max/mdev = [\d.]+/([\d.]+)/')
+INTERFACE_PATTERN = re.compile(r'\d+: ([^:]+):.*state (\w+)')
+
+# Per-interface operstate files; same values 'ip link' shows, read without a fork
+SYSFS_NET = '/sys/class/net'
 
 
 class NetworkMonitor:
@@ -12,27 +33,54 @@ class NetworkMonitor:
         self.packet_loss_threshold = config.get('packet_loss_threshold', 10)
         self.latency_threshold = config.get('latency_threshold', 200)
         self.ignore_interfaces = config.get('ignore_interfaces', [])
+        self.tcp_checks = config.get('tcp_checks', [])  # [{'host': ..., 'port': ...}]
+        self.tcp_timeout = config.get('tcp_timeout', 2)
+        self.cache_ttl = config.get('cache_ttl', 0)  # Seconds to reuse healthy results; 0 disables
+
+    def _icmp_ping(self, host: str, count: int) -> tuple:
+        """Ping in-process with ICMP sockets; returns (packet_loss, avg_latency)"""
+        address = dns_cache.resolve(host)[4][0]
+        result = icmplib.ping(address, count=count, timeout=2, privileged=os.geteuid() == 0)
+        packet_loss = int(round(result.packet_loss * 100))
+        avg_latency = round(result.avg_rtt, 3) if result.packets_received else None
+        return packet_loss, avg_latency
+
+    def _subprocess_ping(self, host: str, count: int) -> tuple:
+        """Ping via the system ping binary; returns (packet_loss, avg_latency)"""
+        result = subprocess.run(
+            ['ping', '-c', str(count), '-W', '2', host],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+
+        # Parse ping output
+        output = result.stdout
 
+        # Extract packet loss
+        packet_loss_match = PACKET_LOSS_PATTERN.search(output)
+        packet_loss = int(packet_loss_match.group(1)) if packet_loss_match else 100
+
+        # Extract average latency
+        latency_match = LATENCY_PATTERN.search(output)
+        avg_latency = float(latency_match.group(1)) if latency_match else None
+
+        return packet_loss, avg_latency
+
+    @ttl_cache
     def ping_host(self, host: str, count: int = 4) -> Dict[str, Any]:
         """Ping a host and return statistics"""
         try:
-            result = subprocess.run(
-                ['ping', '-c', str(count), '-W', '2', host],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-
-            # Parse ping output
-            output = result.stdout
+            packet_loss = None
+            if icmplib is not None:
+                try:
+                    packet_loss, avg_latency = self._icmp_ping(host, count)
+                except icmplib.SocketPermissionError:
+                    # ICMP sockets not permitted for this user (net.ipv4.ping_group_range)
+                    pass
 
-            # Extract packet loss
-            packet_loss_match = re.search(r'(\d+)% packet loss', output)
-            packet_loss = int(packet_loss_match.group(1)) if packet_loss_match else 100
-
-            # Extract average latency
-            latency_match = re.search(r'rtt min/avg/max/mdev = [\d.]+/([\d.]+)/', output)
-            avg_latency = float(latency_match.group(1)) if latency_match else None
+            if packet_loss is None:
+                packet_loss, avg_latency = self._subprocess_ping(host, count)
 
             is_healthy = (
                 packet_loss < self.packet_loss_threshold and
@@ -65,19 +113,31 @@ class NetworkMonitor:
                 'message': f'Failed to ping {host}: {e}'
             }
 
+    def _read_interface_states(self) -> List[tuple]:
+        """Get (interface, operstate) pairs from sysfs, falling back to parsing 'ip link show'"""
+        try:
+            interfaces = []
+            for entry in sorted(os.scandir(SYSFS_NET), key=lambda e: e.name):
+                with open(f'{entry.path}/operstate') as f:
+                    interfaces.append((entry.name, f.read().strip().upper()))
+            return interfaces
+        except OSError:
+            pass  # No sysfs (e.g. some containers)
+
+        result = subprocess.run(
+            ['ip', 'link', 'show'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        return INTERFACE_PATTERN.findall(result.stdout)
+
+    @ttl_cache
     def check_interface_status(self) -> List[Dict[str, Any]]:
         """Check network interface status"""
         results = []
         try:
-            result = subprocess.run(
-                ['ip', 'link', 'show'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-
-            # Parse interface status
-            interfaces = re.findall(r'\d+: ([^:]+):.*state (\w+)', result.stdout)
+            interfaces = self._read_interface_states()
 
             for interface, state in interfaces:
                 # Skip loopback and ignored interfaces
@@ -103,15 +163,99 @@ class NetworkMonitor:
 
         return results
 
-    def run_checks(self) -> List[Dict[str, Any]]:
-        """Run all network checks"""
-        results = []
+    def bulk_tcp_probe(self, targets: List[tuple], timeout: float = 2.0) -> Dict[tuple, Any]:
+        """Connect to many (host, port) targets at once from one thread; returns {target: connect ms or error}"""
+        results = {}
+        pending = {}
+        selector = selectors.DefaultSelector()
 
-        # Ping checks
-        for host in self.hosts:
-            results.append(self.ping_host(host))
+        try:
+            # Start every connect non-blocking, then wait for all of them together
+            for target in targets:
+                try:
+                    family, type_, proto, _, sockaddr = dns_cache.resolve(*target)
+                    sock = socket.socket(family, type_, proto)
+                except OSError as e:
+                    results[target] = str(e)
+                    continue
+
+                try:
+                    sock.setblocking(False)
+                    err = sock.connect_ex(sockaddr)
+                except OSError as e:
+                    results[target] = str(e)
+                    sock.close()
+                    continue
+                if err not in (0, errno.EINPROGRESS):
+                    results[target] = os.strerror(err)
+                    sock.close()
+                    continue
+
+                pending[sock] = (target, time.monotonic())
+                selector.register(sock, selectors.EVENT_WRITE)
+
+            deadline = time.monotonic() + timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                for key, _ in selector.select(remaining):
+                    sock = key.fileobj
+                    target, started = pending.pop(sock)
+                    selector.unregister(sock)
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    results[target] = round((time.monotonic() - started) * 1000, 2) if err == 0 else os.strerror(err)
+                    sock.close()
+
+            for sock, (target, _) in pending.items():
+                results[target] = 'timeout'
+                sock.close()
+        finally:
+            # Don't leak sockets still registered if something above raised
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+
+        return results
 
-        # Interface checks
-        results.extend(self.check_interface_status())
+    def check_tcp_ports(self) -> List[Dict[str, Any]]:
+        """Check that each configured host:port accepts TCP connections"""
+        targets = [(check['host'], check['port']) for check in self.tcp_checks]
+        probes = self.bulk_tcp_probe(targets, self.tcp_timeout)
+
+        results = []
+        for host, port in targets:
+            outcome = probes[(host, port)]
+            if isinstance(outcome, str):
+                results.append({
+                    'metric': 'tcp_port',
+                    'host': host,
+                    'port': port,
+                    'healthy': False,
+                    'error': outcome,
+                    'message': f'TCP {host}:{port} unreachable: {outcome}'
+                })
+            else:
+                results.append({
+                    'metric': 'tcp_port',
+                    'host': host,
+                    'port': port,
+                    'connect_time': outcome,
+                    'healthy': True,
+                    'message': f'TCP {host}:{port} open ({outcome:.0f}ms)'
+                })
+        return results
+
+    def run_checks(self) -> List[Dict[str, Any]]:
+        """Run all network checks"""
+        # Ping all hosts and read interface state concurrently; each ping can take seconds
+        with ThreadPoolExecutor(max_workers=min(32, len(self.hosts) + 2), thread_name_prefix='net') as executor:
+            interface_future = executor.submit(self.check_interface_status)
+            tcp_future = executor.submit(self.check_tcp_ports) if self.tcp_checks else None
+            results = list(executor.map(self.ping_host, self.hosts))
+            results.extend(interface_future.result())
+            if tcp_future:
+                results.extend(tcp_future.result())
 
         return results
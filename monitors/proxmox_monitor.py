@@ -1,10 +1,24 @@
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from .result_cache import ttl_cache
+import time
 
 # Disable SSL warnings for self-signed certs
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# PVE tickets expire after 2 hours; log in again well before that
+TICKET_LIFETIME = 50 * 60
+
+# /cluster/resources guest type -> (result metric, display label)
+GUEST_TYPES = {
+    'qemu': ('proxmox_vm', 'VM'),
+    'lxc': ('proxmox_lxc', 'LXC'),
+}
+
 
 class ProxmoxMonitor:
     """Monitor Proxmox VMs and LXC containers"""
@@ -13,13 +27,22 @@ class ProxmoxMonitor:
         self.config = config
         self.hosts = config.get('hosts', [])
         self.tickets = {}  # Cache authentication tickets
+        self.cache_ttl = config.get('cache_ttl', 0)  # Seconds to reuse healthy results; 0 disables
+
+        # Keep-alive session so repeated polls reuse the TLS connection
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=1, backoff_factor=0.1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def _get_ticket(self, host: str, username: str, password: str) -> tuple:
         """Get authentication ticket from Proxmox"""
         cache_key = f"{host}:{username}"
 
-        if cache_key in self.tickets:
-            return True, self.tickets[cache_key]
+        cached = self.tickets.get(cache_key)
+        if cached and time.monotonic() < cached[2]:
+            return True, cached[:2]
 
         try:
             url = f"https://{host}:8006/api2/json/access/ticket"
@@ -28,13 +51,13 @@ class ProxmoxMonitor:
                 'password': password
             }
 
-            response = requests.post(url, data=data, verify=False, timeout=10)
+            response = self.session.post(url, data=data, timeout=10)
 
             if response.status_code == 200:
                 result = response.json()
                 ticket = result['data']['ticket']
                 csrf_token = result['data']['CSRFPreventionToken']
-                self.tickets[cache_key] = (ticket, csrf_token)
+                self.tickets[cache_key] = (ticket, csrf_token, time.monotonic() + TICKET_LIFETIME)
                 return True, (ticket, csrf_token)
             else:
                 return False, None
@@ -42,16 +65,28 @@ class ProxmoxMonitor:
         except Exception as e:
             return False, None
 
-    def _api_get(self, host: str, ticket_info: tuple, endpoint: str) -> tuple:
+    def _get_auth_headers(self, host_config: Dict[str, Any]) -> tuple:
+        """Get request headers authenticating to a Proxmox host"""
+        api_token = host_config.get('api_token')
+        if api_token:
+            # USER@REALM!TOKENID=UUID; stateless, so no login round-trip
+            return True, {'Authorization': f'PVEAPIToken={api_token}'}
+
+        username = host_config.get('username', 'root@pam')
+        password = host_config.get('password', '')
+        success, ticket_info = self._get_ticket(host_config.get('host'), username, password)
+        if not success:
+            return False, None
+
+        ticket, csrf = ticket_info
+        return True, {'Cookie': f'PVEAuthCookie={ticket}'}
+
+    def _api_get(self, host: str, headers: Dict[str, str], endpoint: str) -> tuple:
         """Make GET request to Proxmox API"""
         try:
-            ticket, csrf = ticket_info
             url = f"https://{host}:8006/api2/json/{endpoint}"
-            headers = {
-                'Cookie': f'PVEAuthCookie={ticket}'
-            }
 
-            response = requests.get(url, headers=headers, verify=False, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
 
             if response.status_code == 200:
                 return True, response.json()['data']
@@ -61,17 +96,16 @@ class ProxmoxMonitor:
         except Exception as e:
             return False, None
 
+    @ttl_cache
     def check_proxmox_host(self, host_config: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check Proxmox host and all VMs/LXCs"""
         results = []
         host = host_config.get('host')
         name = host_config.get('name', host)
-        username = host_config.get('username', 'root@pam')
-        password = host_config.get('password', '')
-        node = host_config.get('node', 'pve')
+        node = host_config.get('node')  # Optional: limit to one cluster node
 
         # Try to authenticate
-        success, ticket_info = self._get_ticket(host, username, password)
+        success, headers = self._get_auth_headers(host_config)
 
         if not success:
             results.append({
@@ -83,46 +117,24 @@ class ProxmoxMonitor:
             })
             return results
 
-        # Get all VMs
-        success, vms = self._api_get(host, ticket_info, f'nodes/{node}/qemu')
-
-        if success and vms:
-            for vm in vms:
-                vmid = vm.get('vmid')
-                vm_name = vm.get('name', f'VM-{vmid}')
-                status = vm.get('status')
-                cpu = vm.get('cpu', 0)
-                mem = vm.get('mem', 0)
-                maxmem = vm.get('maxmem', 1)
-
-                mem_percent = (mem / maxmem * 100) if maxmem > 0 else 0
-                cpu_percent = cpu * 100
-
-                is_healthy = status == 'running' and cpu_percent < 90 and mem_percent < 90
-
-                results.append({
-                    'metric': 'proxmox_vm',
-                    'host': name,
-                    'vmid': vmid,
-                    'name': vm_name,
-                    'status': status,
-                    'healthy': is_healthy,
-                    'cpu_percent': cpu_percent,
-                    'mem_percent': mem_percent,
-                    'message': f'{vm_name} (VM {vmid}): {status}'
-                })
-
-        # Get all LXC containers
-        success, lxcs = self._api_get(host, ticket_info, f'nodes/{node}/lxc')
-
-        if success and lxcs:
-            for lxc in lxcs:
-                vmid = lxc.get('vmid')
-                lxc_name = lxc.get('name', f'LXC-{vmid}')
-                status = lxc.get('status')
-                cpu = lxc.get('cpu', 0)
-                mem = lxc.get('mem', 0)
-                maxmem = lxc.get('maxmem', 1)
+        # Get all VMs and LXC containers in one request
+        success, resources = self._api_get(host, headers, 'cluster/resources?type=vm')
+
+        if success and resources:
+            for resource in resources:
+                guest_type = resource.get('type')
+                if guest_type not in GUEST_TYPES:
+                    continue
+                if node and resource.get('node') != node:
+                    continue
+
+                metric, label = GUEST_TYPES[guest_type]
+                vmid = resource.get('vmid')
+                guest_name = resource.get('name', f'{label}-{vmid}')
+                status = resource.get('status')
+                cpu = resource.get('cpu', 0)
+                mem = resource.get('mem', 0)
+                maxmem = resource.get('maxmem', 1)
 
                 mem_percent = (mem / maxmem * 100) if maxmem > 0 else 0
                 cpu_percent = cpu * 100
@@ -130,15 +142,15 @@ class ProxmoxMonitor:
                 is_healthy = status == 'running' and cpu_percent < 90 and mem_percent < 90
 
                 results.append({
-                    'metric': 'proxmox_lxc',
+                    'metric': metric,
                     'host': name,
                     'vmid': vmid,
-                    'name': lxc_name,
+                    'name': guest_name,
                     'status': status,
                     'healthy': is_healthy,
                     'cpu_percent': cpu_percent,
                     'mem_percent': mem_percent,
-                    'message': f'{lxc_name} (LXC {vmid}): {status}'
+                    'message': f'{guest_name} ({label} {vmid}): {status}'
                 })
 
         return results
@@ -147,7 +159,14 @@ class ProxmoxMonitor:
         """Run all Proxmox checks"""
         results = []
 
-        for host_config in self.hosts:
-            results.extend(self.check_proxmox_host(host_config))
+        if len(self.hosts) <= 1:
+            for host_config in self.hosts:
+                results.extend(self.check_proxmox_host(host_config))
+            return results
+
+        # Hosts are independent, so query them in parallel
+        with ThreadPoolExecutor(max_workers=min(32, len(self.hosts)), thread_name_prefix='pve') as executor:
+            for host_results in executor.map(self.check_proxmox_host, self.hosts):
+                results.extend(host_results)
 
         return results
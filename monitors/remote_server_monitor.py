@@ -1,6 +1,15 @@
 import subprocess
-import json
+import re
+import socket
 from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from . import dns_cache
+from .ssh_control import ssh_options
+
+# Remote stats in one round-trip: /proc reads via a single cat, CPU count, and df for /
+STATS_COMMAND = "cat /proc/uptime /proc/loadavg /proc/meminfo; echo ---; grep -c ^processor /proc/cpuinfo; df -PB1 /"
+
+MEMINFO_PATTERN = re.compile(r'^(MemTotal|MemAvailable):\s+(\d+) kB', re.MULTILINE)
 
 
 class RemoteServerMonitor:
@@ -10,12 +19,14 @@ class RemoteServerMonitor:
         self.config = config
         self.servers = config.get('servers', [])
 
-    def _ssh_command(self, host: str, user: str, command: str, timeout: int = 10) -> tuple:
+        # Reuse one SSH connection per host across commands and cycles
+        self.ssh_options = ssh_options(config)
+
+    def _ssh_command(self, host: str, user: str, command: str, timeout: int = 10, port: int = 22) -> tuple:
         """Execute command on remote server via SSH"""
         try:
             result = subprocess.run(
-                ['ssh', '-o', 'ConnectTimeout=5', '-o', 'StrictHostKeyChecking=no',
-                 f'{user}@{host}', command],
+                ['ssh', *self.ssh_options, '-p', str(port), f'{user}@{host}', command],
                 capture_output=True,
                 text=True,
                 timeout=timeout
@@ -26,20 +37,43 @@ class RemoteServerMonitor:
         except Exception as e:
             return False, "", str(e)
 
+    def _parse_stats(self, output: str) -> Dict[str, Any]:
+        """Parse STATS_COMMAND output into uptime, load, CPU, memory and root disk figures"""
+        proc, _, tail = output.partition('---\n')
+        lines = proc.splitlines()
+        meminfo = dict(MEMINFO_PATTERN.findall(proc))
+        mem_total = int(meminfo['MemTotal']) * 1024
+
+        tail_lines = tail.splitlines()
+        df_fields = tail_lines[2].split()  # cpu count, df header, then the / row
+
+        return {
+            'uptime': int(float(lines[0].split()[0])),
+            'load': float(lines[1].split()[0]),
+            'cpu_count': int(tail_lines[0]),
+            'mem_total': mem_total,
+            'mem_used': mem_total - int(meminfo['MemAvailable']) * 1024,
+            'disk_root': int(int(df_fields[2]) / int(df_fields[1]) * 100)
+        }
+
     def check_server(self, server_config: Dict[str, Any]) -> Dict[str, Any]:
         """Check health of a remote server"""
         host = server_config.get('host')
         user = server_config.get('user', 'root')
         name = server_config.get('name', host)
+        port = server_config.get('port', 22)  # sshd port, used for both the probe and ssh itself
 
-        # Basic connectivity check
-        ping_result = subprocess.run(
-            ['ping', '-c', '2', '-W', '2', host],
-            capture_output=True,
-            timeout=5
-        )
-
-        if ping_result.returncode != 0:
+        # Basic connectivity check: TCP connect to sshd also proves SSH is reachable
+        try:
+            family, type_, proto, _, sockaddr = dns_cache.resolve(host, port)
+            with socket.socket(family, type_, proto) as sock:
+                sock.settimeout(2)
+                sock.connect(sockaddr)
+            reachable = True
+        except OSError:
+            reachable = False
+
+        if not reachable:
             return {
                 'metric': 'remote_server',
                 'server': name,
@@ -50,7 +84,7 @@ class RemoteServerMonitor:
             }
 
         # SSH connectivity check
-        success, stdout, stderr = self._ssh_command(host, user, 'echo "OK"')
+        success, stdout, stderr = self._ssh_command(host, user, 'echo "OK"', port=port)
 
         if not success:
             return {
@@ -62,27 +96,14 @@ class RemoteServerMonitor:
                 'message': f'SSH to {name} failed: {stderr}'
             }
 
-        # Get system stats
-        stats_cmd = """
-        echo '{'
-        echo '"uptime":'$(cat /proc/uptime | awk '{print int($1)}')','
-        echo '"load":'$(cat /proc/loadavg | awk '{print $1}')','
-        echo '"cpu_count":'$(nproc)','
-        echo '"mem_total":'$(free -b | awk '/^Mem:/ {print $2}')','
-        echo '"mem_used":'$(free -b | awk '/^Mem:/ {print $3}')','
-        echo '"disk_root":'$(df -B1 / | awk 'NR==2 {print int($3/$2*100)}')
-        echo '}'
-        """
-
-        success, stats_json, stderr = self._ssh_command(host, user, stats_cmd)
+        # Get system stats: raw /proc files and df in one command, parsed locally
+        success, stats_output, stderr = self._ssh_command(host, user, STATS_COMMAND, port=port)
 
         if success:
             try:
-                stats = json.loads(stats_json)
+                stats = self._parse_stats(stats_output)
                 mem_percent = (stats['mem_used'] / stats['mem_total']) * 100
-                cpu_load = float(stats['load'])
-                cpu_count = int(stats['cpu_count'])
-                load_percent = (cpu_load / cpu_count) * 100
+                load_percent = (stats['load'] / stats['cpu_count']) * 100
 
                 issues = []
                 if load_percent > 80:
@@ -117,9 +138,9 @@ class RemoteServerMonitor:
 
     def run_checks(self) -> List[Dict[str, Any]]:
         """Run all remote server checks"""
-        results = []
-
-        for server in self.servers:
-            results.append(self.check_server(server))
+        if len(self.servers) <= 1:
+            return [self.check_server(server) for server in self.servers]
 
-        return results
+        # Each server check is a TCP probe plus SSH round-trips, so run them in parallel
+        with ThreadPoolExecutor(max_workers=min(32, len(self.servers)), thread_name_prefix='remote') as executor:
+            return list(executor.map(self.check_server, self.servers))
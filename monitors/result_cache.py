@@ -0,0 +1,37 @@
+import functools
+import time
+
+
+def _is_healthy(result) -> bool:
+    """True if a check result (one dict or a list of dicts) reports no problems"""
+    if isinstance(result, list):
+        return all(item.get('healthy', False) for item in result)
+    return result.get('healthy', False)
+
+
+def ttl_cache(method):
+    """Reuse a healthy check result for self.cache_ttl seconds, keyed by the call arguments"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        ttl = getattr(self, 'cache_ttl', 0)
+        if not ttl:
+            return method(self, *args, **kwargs)
+
+        cache = self.__dict__.setdefault('_result_cache', {})
+        key = (method.__name__, repr(args), repr(sorted(kwargs.items())))  # Arguments may be config dicts
+        now = time.monotonic()
+
+        cached = cache.get(key)
+        if cached and now < cached[0]:
+            return cached[1]
+
+        result = method(self, *args, **kwargs)
+
+        # Only healthy results are reused, so a failure is re-checked on the next call
+        if _is_healthy(result):
+            cache[key] = (now + ttl, result)
+        else:
+            cache.pop(key, None)
+        return result
+
+    return wrapper
@@ -0,0 +1,23 @@
+import os
+from typing import Dict, List, Any
+
+DEFAULT_CONTROL_PATH = '~/.ssh/nm-%C'
+
+
+def ssh_options(config: Dict[str, Any]) -> List[str]:
+    """Build ssh options that reuse one connection per host across commands and cycles (OpenSSH ControlMaster)"""
+    control_path = config.get('ssh_control_path', DEFAULT_CONTROL_PATH)
+
+    # ssh won't create the control socket directory itself
+    try:
+        os.makedirs(os.path.dirname(os.path.expanduser(control_path)), mode=0o700, exist_ok=True)
+    except OSError as e:
+        print(f"Warning: Could not create SSH control directory: {e}")
+
+    return [
+        '-o', 'ConnectTimeout=5',
+        '-o', 'StrictHostKeyChecking=no',
+        '-o', 'ControlMaster=auto',
+        '-o', f'ControlPath={control_path}',
+        '-o', f"ControlPersist={config.get('ssh_control_persist', 600)}"
+    ]
@@ -1,7 +1,14 @@
 import psutil
 import subprocess
 import os
+import threading
+import time
 from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from .result_cache import ttl_cache
+
+# Filesystems whose mount checks run in-process; any other type is probed with a timeout
+LOCAL_FS_TYPES = frozenset({'ext2', 'ext3', 'ext4', 'xfs', 'btrfs', 'zfs', 'f2fs', 'vfat', 'exfat', 'ntfs', 'tmpfs'})
 
 
 class SystemMonitor:
@@ -14,6 +21,21 @@ class SystemMonitor:
         self.disk_threshold = config.get('disk_threshold', 90)
         self.services_to_check = config.get('check_services', [])
         self.mounts_to_check = config.get('check_mounts', [])
+        self.mount_timeout = config.get('mount_timeout', 5)  # Seconds before a network mount check counts as hung
+        self._hung_mount_probes = {}  # mount path -> probe thread still blocked on it
+        self.cache_ttl = config.get('cache_ttl', 0)  # Seconds to reuse healthy results; 0 disables
+
+        # Partition list changes rarely; per-mount usage is reused briefly
+        self.partitions_refresh = config.get('disk_partitions_refresh', 300)
+        self.disk_usage_ttl = config.get('disk_usage_ttl', 15)
+        self._partitions = None
+        self._partitions_expires = 0.0
+        self._disk_usage_cache = {}  # mountpoint -> (expires, usage)
+
+        # Per-process CPU ticks from the previous /proc scan, for deltas
+        self._clock_ticks = os.sysconf('SC_CLK_TCK')
+        self._prev_cpu_ticks = {}  # pid -> utime + stime
+        self._prev_cpu_scan = None
 
     def check_cpu(self) -> Dict[str, Any]:
         """Check CPU usage"""
@@ -37,16 +59,33 @@ class SystemMonitor:
             'message': f'Memory usage at {memory.percent}% ({memory.used // (1024**3)}GB / {memory.total // (1024**3)}GB)'
         }
 
+    def _get_partitions(self) -> list:
+        """Get mounted partitions, re-reading the mount table every few minutes"""
+        now = time.monotonic()
+        if self._partitions is None or now >= self._partitions_expires:
+            # Skip snap partitions (read-only squashfs, always 100%)
+            self._partitions = [p for p in psutil.disk_partitions() if not p.mountpoint.startswith('/snap/')]
+            self._partitions_expires = now + self.partitions_refresh
+            self._disk_usage_cache.clear()  # Drop entries for mounts that went away
+        return self._partitions
+
+    def _get_disk_usage(self, mountpoint: str):
+        """Get disk usage for a mountpoint, reusing a result younger than disk_usage_ttl"""
+        now = time.monotonic()
+        cached = self._disk_usage_cache.get(mountpoint)
+        if cached and now < cached[0]:
+            return cached[1]
+
+        usage = psutil.disk_usage(mountpoint)
+        self._disk_usage_cache[mountpoint] = (now + self.disk_usage_ttl, usage)
+        return usage
+
     def check_disk(self) -> List[Dict[str, Any]]:
         """Check disk usage for all partitions"""
         issues = []
-        for partition in psutil.disk_partitions():
-            # Skip snap partitions (read-only squashfs, always 100%)
-            if partition.mountpoint.startswith('/snap/'):
-                continue
-
+        for partition in self._get_partitions():
             try:
-                usage = psutil.disk_usage(partition.mountpoint)
+                usage = self._get_disk_usage(partition.mountpoint)
                 is_healthy = usage.percent < self.disk_threshold
                 if not is_healthy or partition.mountpoint == '/':  # Always report root
                     issues.append({
@@ -87,20 +126,85 @@ class SystemMonitor:
                 'message': f'Failed to check service {service_name}: {e}'
             }
 
+    @ttl_cache
+    def check_services(self, service_names: List[str]) -> List[Dict[str, Any]]:
+        """Check several systemd services with a single systemctl call"""
+        if not service_names:
+            return []
+
+        try:
+            result = subprocess.run(
+                ['systemctl', 'is-active', *service_names],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            states = result.stdout.splitlines()
+            if len(states) != len(service_names):
+                # Output doesn't line up with the units asked for; check them one by one
+                return [self.check_service(service_name) for service_name in service_names]
+        except Exception as e:
+            return [{
+                'metric': 'service_status',
+                'service': service_name,
+                'healthy': False,
+                'error': str(e),
+                'message': f'Failed to check service {service_name}: {e}'
+            } for service_name in service_names]
+
+        return [{
+            'metric': 'service_status',
+            'service': service_name,
+            'healthy': state == 'active',
+            'status': state,
+            'message': f'Service {service_name} is {state}'
+        } for service_name, state in zip(service_names, states)]
+
+    def _read_cpu_ticks(self) -> Dict[int, tuple]:
+        """Read (name, utime + stime) for every process straight from /proc/[pid]/stat"""
+        ticks = {}
+        for entry in os.scandir('/proc'):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry.name}/stat', 'rb') as f:
+                    stat = f.read()
+            except OSError:
+                continue  # Process exited or is not readable
+
+            # comm may contain spaces or parens, so split around the last ')'
+            head, _, rest = stat.rpartition(b')')
+            fields = rest.split()
+            ticks[int(entry.name)] = (
+                head.partition(b'(')[2].decode(errors='replace'),
+                int(fields[11]) + int(fields[12])  # utime, stime (fields 14 and 15)
+            )
+        return ticks
+
     def check_processes(self) -> Dict[str, Any]:
         """Check for problematic processes"""
         issues = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                if proc.info['cpu_percent'] > 90:
+        now = time.monotonic()
+        ticks = self._read_cpu_ticks()
+
+        # CPU percent is per core, measured between this scan and the last one
+        if self._prev_cpu_scan is not None:
+            elapsed_ticks = (now - self._prev_cpu_scan) * self._clock_ticks
+            for pid, (name, total) in ticks.items():
+                prev = self._prev_cpu_ticks.get(pid)
+                if prev is None:
+                    continue
+                cpu_percent = (total - prev) / elapsed_ticks * 100
+                if cpu_percent > 90:
                     issues.append({
-                        'pid': proc.info['pid'],
-                        'name': proc.info['name'],
-                        'cpu': proc.info['cpu_percent'],
+                        'pid': pid,
+                        'name': name,
+                        'cpu': round(cpu_percent, 1),
                         'issue': 'high_cpu'
                     })
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
+
+        self._prev_cpu_ticks = {pid: total for pid, (name, total) in ticks.items()}
+        self._prev_cpu_scan = now
 
         return {
             'metric': 'processes',
@@ -109,6 +213,54 @@ class SystemMonitor:
             'message': f'Found {len(issues)} problematic processes'
         }
 
+    def _probe_mount(self, mount_point: str) -> tuple:
+        """Stat and read a mount point; returns (issue, detail), with issue None when it is healthy"""
+        # A mount point is on a different device than its parent (or is its own parent, for /)
+        try:
+            mount_stat = os.stat(mount_point)
+            parent_stat = os.stat(os.path.join(mount_point, '..'))
+        except FileNotFoundError:
+            return 'mount_point_missing', None
+        except OSError as e:
+            return 'stale_mount', str(e)
+
+        if mount_stat.st_dev == parent_stat.st_dev and mount_stat.st_ino != parent_stat.st_ino:
+            return 'not_mounted', None
+
+        # Check if mount is accessible (can read one entry; no need to list everything)
+        try:
+            with os.scandir(mount_point) as entries:
+                next(entries, None)
+        except PermissionError:
+            return 'permission_denied', None
+        except OSError as e:
+            return 'stale_mount', str(e)
+
+        return None, None
+
+    def _probe_mount_bounded(self, mount_point: str) -> tuple:
+        """Run _probe_mount in a daemon thread, reporting a stale mount if it doesn't finish in time"""
+        # A hung hard mount blocks its prober in uninterruptible sleep; don't stack more on it
+        hung = self._hung_mount_probes.get(mount_point)
+        if hung is not None:
+            if hung.is_alive():
+                return 'stale_mount', 'a previous check is still blocked (may be hung)'
+            del self._hung_mount_probes[mount_point]
+
+        outcome = []
+        prober = threading.Thread(
+            target=lambda: outcome.append(self._probe_mount(mount_point)),
+            name=f'mount-probe:{mount_point}',
+            daemon=True
+        )
+        prober.start()
+        prober.join(self.mount_timeout)
+
+        if prober.is_alive():
+            self._hung_mount_probes[mount_point] = prober
+            return 'stale_mount', f'timed out after {self.mount_timeout}s (may be hung)'
+        return outcome[0]
+
     def check_mount(self, mount_config: Dict[str, Any]) -> Dict[str, Any]:
         """Check if a mount point is accessible"""
         mount_point = mount_config.get('path')
@@ -123,41 +275,13 @@ class SystemMonitor:
             }
 
         try:
-            # Check if mount point exists
-            if not os.path.exists(mount_point):
-                return {
-                    'metric': 'mount_status',
-                    'mount': mount_point,
-                    'type': mount_type,
-                    'healthy': False,
-                    'issue': 'mount_point_missing',
-                    'message': f'Mount point {mount_point} does not exist',
-                    'config': mount_config
-                }
+            # Only local filesystems are safe to stat in-process; network ones can hang indefinitely
+            if mount_type in LOCAL_FS_TYPES:
+                issue, detail = self._probe_mount(mount_point)
+            else:
+                issue, detail = self._probe_mount_bounded(mount_point)
 
-            # Check if it's actually mounted
-            result = subprocess.run(
-                ['mountpoint', '-q', mount_point],
-                capture_output=True,
-                timeout=5
-            )
-
-            is_mounted = result.returncode == 0
-
-            if not is_mounted:
-                return {
-                    'metric': 'mount_status',
-                    'mount': mount_point,
-                    'type': mount_type,
-                    'healthy': False,
-                    'issue': 'not_mounted',
-                    'message': f'Mount {mount_point} ({mount_type}) is not mounted',
-                    'config': mount_config
-                }
-
-            # Check if mount is accessible (can read)
-            try:
-                os.listdir(mount_point)
+            if issue is None:
                 return {
                     'metric': 'mount_status',
                     'mount': mount_point,
@@ -165,37 +289,26 @@ class SystemMonitor:
                     'healthy': True,
                     'message': f'Mount {mount_point} is accessible'
                 }
-            except PermissionError:
-                return {
-                    'metric': 'mount_status',
-                    'mount': mount_point,
-                    'type': mount_type,
-                    'healthy': False,
-                    'issue': 'permission_denied',
-                    'message': f'Mount {mount_point} exists but is not accessible (permission denied)',
-                    'config': mount_config
-                }
-            except OSError as e:
-                return {
-                    'metric': 'mount_status',
-                    'mount': mount_point,
-                    'type': mount_type,
-                    'healthy': False,
-                    'issue': 'stale_mount',
-                    'message': f'Mount {mount_point} appears stale or disconnected: {str(e)}',
-                    'config': mount_config
-                }
 
-        except subprocess.TimeoutExpired:
+            if issue == 'mount_point_missing':
+                message = f'Mount point {mount_point} does not exist'
+            elif issue == 'not_mounted':
+                message = f'Mount {mount_point} ({mount_type}) is not mounted'
+            elif issue == 'permission_denied':
+                message = f'Mount {mount_point} exists but is not accessible (permission denied)'
+            else:
+                message = f'Mount {mount_point} appears stale or disconnected: {detail}'
+
             return {
                 'metric': 'mount_status',
                 'mount': mount_point,
                 'type': mount_type,
                 'healthy': False,
-                'issue': 'timeout',
-                'message': f'Timeout checking mount {mount_point} (may be hung)',
+                'issue': issue,
+                'message': message,
                 'config': mount_config
             }
+
         except Exception as e:
             return {
                 'metric': 'mount_status',
@@ -210,23 +323,27 @@ class SystemMonitor:
     def run_checks(self) -> List[Dict[str, Any]]:
         """Run all system checks"""
         results = []
+        workers = min(32, 1 + len(self.mounts_to_check))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='system') as executor:
+            # Start service and mount checks first so they overlap the 1s CPU sample
+            services_future = executor.submit(self.check_services, self.services_to_check)
+            mount_futures = [executor.submit(self.check_mount, mount) for mount in self.mounts_to_check]
 
-        # CPU check
-        results.append(self.check_cpu())
+            # CPU check
+            results.append(self.check_cpu())
 
-        # Memory check
-        results.append(self.check_memory())
+            # Memory check
+            results.append(self.check_memory())
 
-        # Disk checks
-        results.extend(self.check_disk())
+            # Disk checks
+            results.extend(self.check_disk())
 
-        # Service checks
-        for service in self.services_to_check:
-            results.append(self.check_service(service))
+            # Service checks
+            results.extend(services_future.result())
 
-        # Mount checks
-        for mount in self.mounts_to_check:
-            results.append(self.check_mount(mount))
+            # Mount checks
+            results.extend(future.result() for future in mount_futures)
 
         # Process check
         results.append(self.check_processes())
@@ -1,11 +1,18 @@
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from .result_cache import ttl_cache
 import time
 
 # Disable SSL warnings for self-signed certificates
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Largest response body read just to keep the connection reusable
+MAX_DRAIN_BYTES = 64 * 1024
+
 
 class WebMonitor:
     """Monitors web services and APIs"""
@@ -13,19 +20,37 @@ class WebMonitor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.endpoints = config.get('endpoints', [])
+        self.cache_ttl = config.get('cache_ttl', 0)  # Seconds to reuse healthy results; 0 disables
+
+        # Keep-alive session shared by all endpoint checks
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=1, backoff_factor=0.1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
+    @ttl_cache
     def check_endpoint(self, endpoint: Dict[str, Any]) -> Dict[str, Any]:
         """Check if a web endpoint is responding correctly"""
         url = endpoint['url']
         name = endpoint.get('name', url)
         timeout = endpoint.get('timeout', 5)
         expected_status = endpoint.get('expected_status', 200)
+        method = endpoint.get('method', 'GET')  # HEAD skips the body entirely
 
         try:
             start_time = time.time()
-            response = requests.get(url, timeout=timeout, allow_redirects=True, verify=False)
+            response = self.session.request(method, url, timeout=timeout, allow_redirects=True, stream=True)
             response_time = (time.time() - start_time) * 1000  # Convert to ms
 
+            # Only the status matters: drain small bodies so the connection returns to the
+            # pool, and drop the connection rather than download a large one
+            content_length = response.headers.get('Content-Length')
+            if content_length is not None and content_length.isdigit() and int(content_length) <= MAX_DRAIN_BYTES:
+                for _ in response.iter_content(MAX_DRAIN_BYTES):
+                    pass  # Read and discard the body
+            response.close()
+
             is_healthy = response.status_code == expected_status
 
             return {
@@ -69,9 +94,9 @@ class WebMonitor:
 
     def run_checks(self) -> List[Dict[str, Any]]:
         """Run all web service checks"""
-        results = []
-
-        for endpoint in self.endpoints:
-            results.append(self.check_endpoint(endpoint))
+        if len(self.endpoints) <= 1:
+            return [self.check_endpoint(endpoint) for endpoint in self.endpoints]
 
-        return results
+        # Endpoints are independent, so wall-clock is bounded by the slowest one
+        with ThreadPoolExecutor(max_workers=min(32, len(self.endpoints)), thread_name_prefix='web') as executor:
+            return list(executor.map(self.check_endpoint, self.endpoints))
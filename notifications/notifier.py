@@ -1,9 +1,49 @@
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, wait
 import os
-from datetime import datetime
 import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Discord rejects webhook messages with more embeds, or more embed text, than this
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_EMBED_CHARS = 6000
+
+# Discord embed colors, keyed by both our names and Slack's
+DISCORD_COLORS = {
+    'green': 0x00FF00,
+    'orange': 0xFFA500,
+    'red': 0xFF0000,
+    'good': 0x00FF00,
+    'warning': 0xFFA500,
+    'danger': 0xFF0000
+}
+
+# One formatter shared by the file and console handlers
+LOG_FORMATTER = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+_timestamp = (0, '')  # (epoch second, UTC ISO 8601 string), swapped as one tuple so threads see a matching pair
+
+
+def _now_timestamp() -> tuple:
+    """Get the current epoch second and its UTC ISO 8601 form, formatting at most once per second"""
+    global _timestamp
+    now = int(time.time())
+    if now != _timestamp[0]:
+        _timestamp = (now, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)))
+    return _timestamp
 
 
 class Notifier:
@@ -23,25 +63,19 @@ class Notifier:
         # File handler
         try:
             file_handler = logging.FileHandler(log_file)
-            file_handler.setFormatter(
-                logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            )
+            file_handler.setFormatter(LOG_FORMATTER)
             self.logger.addHandler(file_handler)
         except PermissionError:
             # Fallback to local log file
             fallback_log = os.path.expanduser('~/network-monitor-agent.log')
             file_handler = logging.FileHandler(fallback_log)
-            file_handler.setFormatter(
-                logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            )
+            file_handler.setFormatter(LOG_FORMATTER)
             self.logger.addHandler(file_handler)
             print(f"Warning: Could not write to {log_file}, using {fallback_log}")
 
         # Console handler
         console_handler = logging.StreamHandler()
-        console_handler.setFormatter(
-            logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        )
+        console_handler.setFormatter(LOG_FORMATTER)
         self.logger.addHandler(console_handler)
 
         # Slack config
@@ -52,55 +86,87 @@ class Notifier:
         self.discord_config = config.get('discord', {})
         self.discord_enabled = self.discord_config.get('enabled', False)
         self.discord_webhook = os.getenv('DISCORD_WEBHOOK_URL') or self.discord_config.get('webhook_url')
-        self.discord_notify_on = self.discord_config.get('notify_on', [])
+        self.discord_notify_on = frozenset(self.discord_config.get('notify_on') or ())
+
+        # Keep-alive session shared by the Slack and Discord webhooks
+        self._http = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({'POST'}),
+                raise_on_status=False
+            )
+        )
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+        self._webhook_requests = {}  # url -> PreparedRequest template; each send only swaps in the body
+
+        # Webhook POSTs run here so slow endpoints can't stall a monitoring cycle
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='notifier')
+        self._pending = set()
+        self._pending_lock = threading.Lock()  # Added to by senders, discarded from by pool threads
 
-    def log_info(self, message: str):
-        """Log info message"""
-        self.logger.info(message)
+        # Recently sent webhook messages, so a persisting problem isn't re-posted every cycle
+        self.dedup_ttl = config.get('notify_dedup_ttl', 7200)  # 0 disables
+        self.dedup_max = config.get('notify_dedup_size', 2048)
+        self._sent = OrderedDict()  # md5(channel|message) -> sent_at
+        self._sent_lock = threading.Lock()
 
-    def log_warning(self, message: str):
-        """Log warning message"""
-        self.logger.warning(message)
+        # Per-thread buffers while inside batch(); None means send immediately
+        self._batch = threading.local()
 
-    def log_error(self, message: str):
-        """Log error message"""
-        self.logger.error(message)
+    def log_debug(self, message: str, *args):
+        """Log debug message (args are %-formatted only if the level is enabled)"""
+        self.logger.debug(message, *args)
+
+    def log_info(self, message: str, *args):
+        """Log info message (args are %-formatted only if the level is enabled)"""
+        self.logger.info(message, *args)
+
+    def log_warning(self, message: str, *args):
+        """Log warning message (args are %-formatted only if the level is enabled)"""
+        self.logger.warning(message, *args)
+
+    def log_error(self, message: str, *args):
+        """Log error message (args are %-formatted only if the level is enabled)"""
+        self.logger.error(message, *args)
 
     def _should_notify_discord(self, event_type: str, severity: str = None) -> bool:
         """Check if event should trigger Discord notification"""
         if not self.discord_enabled:
             return False
 
-        if event_type == 'actions_taken' and 'actions_taken' in self.discord_notify_on:
-            return True
-        if event_type == 'critical_issues' and 'critical_issues' in self.discord_notify_on:
-            return severity in ['critical', 'high']
-        if event_type == 'daily_summary' and 'daily_summary' in self.discord_notify_on:
-            return True
-
-        return False
+        if event_type == 'critical_issues':
+            return 'critical_issues' in self.discord_notify_on and severity in ('critical', 'high')
+        return event_type in self.discord_notify_on
 
     def notify_issue_detected(self, issues: List[Dict[str, Any]]):
         """Notify about detected issues"""
         if not issues:
             return
 
-        message = f"🚨 Detected {len(issues)} issue(s):\n"
-        for issue in issues:
-            message += f"  • {issue.get('message', 'Unknown issue')}\n"
+        parts = [f"🚨 Detected {len(issues)} issue(s):"]
+        parts.extend(f"  • {issue.get('message', 'Unknown issue')}" for issue in issues)
+        message = '\n'.join(parts)
 
         self.log_warning(message)
 
         # Send to Slack
-        if len(issues) > 0:
-            self._send_slack(message, color='warning')
+        self._send_slack(message, color='warning')
 
         # Send to Discord only if we have critical/high severity issues
+        if not self._should_notify_discord('critical_issues', 'critical'):
+            return
+
         critical_issues = [i for i in issues if i.get('severity') in ['critical', 'high']]
-        if critical_issues and self._should_notify_discord('critical_issues', 'critical'):
-            critical_message = f"🚨 Detected {len(critical_issues)} critical issue(s):\n"
-            for issue in critical_issues:
-                critical_message += f"  • {issue.get('message', 'Unknown issue')}\n"
+        if critical_issues:
+            parts = [f"🚨 Detected {len(critical_issues)} critical issue(s):"]
+            parts.extend(f"  • {issue.get('message', 'Unknown issue')}" for issue in critical_issues)
+            critical_message = '\n'.join(parts)
             self._send_discord(critical_message, color='red')
 
     def notify_action_taken(self, action: Dict[str, Any], success: bool, result_message: str):
@@ -110,29 +176,35 @@ class Notifier:
         severity = action.get('severity', 'unknown')
 
         if success:
-            message = f"✅ Successfully executed {action_type}\n"
-            message += f"  Issue: {issue}\n"
-            message += f"  Result: {result_message}"
+            message = '\n'.join((
+                f"✅ Successfully executed {action_type}",
+                f"  Issue: {issue}",
+                f"  Result: {result_message}"
+            ))
             self.log_info(message)
             self._send_slack(message, color='good')
             # Only send to Discord if actions_taken notifications are enabled
             if self._should_notify_discord('actions_taken'):
                 self._send_discord(message, color='green')
         else:
-            message = f"❌ Failed to execute {action_type}\n"
-            message += f"  Issue: {issue}\n"
-            message += f"  Severity: {severity}\n"
-            message += f"  Error: {result_message}"
+            message = '\n'.join((
+                f"❌ Failed to execute {action_type}",
+                f"  Issue: {issue}",
+                f"  Severity: {severity}",
+                f"  Error: {result_message}"
+            ))
             self.log_error(message)
             self._send_slack(message, color='danger')
             self._send_discord(message, color='red')
 
     def notify_critical_issue(self, issue: Dict[str, Any]):
         """Notify about critical issue requiring human intervention"""
-        message = f"🔴 CRITICAL ISSUE - Human intervention required\n"
-        message += f"  Issue: {issue.get('issue', 'Unknown')}\n"
-        message += f"  Root cause: {issue.get('root_cause', 'Unknown')}\n"
-        message += f"  Reasoning: {issue.get('reasoning', 'N/A')}"
+        message = '\n'.join((
+            "🔴 CRITICAL ISSUE - Human intervention required",
+            f"  Issue: {issue.get('issue', 'Unknown')}",
+            f"  Root cause: {issue.get('root_cause', 'Unknown')}",
+            f"  Reasoning: {issue.get('reasoning', 'N/A')}"
+        ))
 
         self.log_error(message)
         self._send_slack(message, color='danger')
@@ -143,71 +215,166 @@ class Notifier:
         message = "✨ All systems healthy"
         self.log_info(message)
 
+    def _dedup_key(self, channel: str, message: str) -> bytes:
+        """Get the dedupe key for a webhook message, or None if deduping is disabled"""
+        if not self.dedup_ttl:
+            return None
+        return hashlib.md5(f"{channel}|{message}".encode()).digest()
+
+    def _already_sent(self, key: bytes) -> bool:
+        """Record a webhook message as sent; True if the same one was sent within dedup_ttl"""
+        if key is None:
+            return False
+
+        now = time.time()
+
+        with self._sent_lock:
+            sent_at = self._sent.get(key)
+            if sent_at is not None and now - sent_at <= self.dedup_ttl:
+                return True
+
+            self._sent[key] = now
+            self._sent.move_to_end(key)
+            while len(self._sent) > self.dedup_max:
+                self._sent.popitem(last=False)
+
+        return False
+
+    def _forget_sent(self, keys: List[bytes]):
+        """Drop dedupe records for messages whose post failed, so they are sent again next time"""
+        with self._sent_lock:
+            for key in keys:
+                if key is not None:
+                    self._sent.pop(key, None)
+
     def _send_slack(self, message: str, color: str = 'good'):
         """Send notification to Slack"""
         if not self.slack_enabled or not self.slack_webhook:
             return
 
+        key = self._dedup_key('slack', message)
+        if self._already_sent(key):
+            return
+
         try:
-            payload = {
-                'attachments': [{
-                    'color': color,
-                    'text': message,
-                    'footer': 'Network Monitor Agent',
-                    'ts': int(datetime.now().timestamp())
-                }]
+            attachment = {
+                'color': color,
+                'text': message,
+                'footer': 'Network Monitor Agent',
+                'ts': _now_timestamp()[0]
             }
 
-            response = requests.post(
-                self.slack_webhook,
-                json=payload,
-                timeout=10
-            )
+            buffer = getattr(self._batch, 'buffer', None)
+            if buffer is not None:
+                buffer['slack'].append((key, attachment))
+                return
 
-            if response.status_code != 200:
-                self.logger.error(f"Failed to send Slack notification: {response.status_code}")
+            self._post_webhook('Slack', self.slack_webhook, {'attachments': [attachment]}, (200,), [key])
 
         except Exception as e:
-            self.logger.error(f"Error sending Slack notification: {e}")
+            self.logger.error("Error sending Slack notification: %s", e)
 
     def _send_discord(self, message: str, color: str = 'green'):
         """Send notification to Discord"""
         if not self.discord_enabled or not self.discord_webhook:
             return
 
+        key = self._dedup_key('discord', message)
+        if self._already_sent(key):
+            return
+
         try:
-            # Discord color codes
-            color_map = {
-                'green': 0x00FF00,
-                'orange': 0xFFA500,
-                'red': 0xFF0000,
-                'good': 0x00FF00,
-                'warning': 0xFFA500,
-                'danger': 0xFF0000
+            embed = {
+                'description': message,
+                'color': DISCORD_COLORS.get(color, 0x00FF00),
+                'footer': {
+                    'text': 'Network Monitor Agent'
+                },
+                'timestamp': _now_timestamp()[1]
             }
 
-            payload = {
-                'embeds': [{
-                    'description': message,
-                    'color': color_map.get(color, 0x00FF00),
-                    'footer': {
-                        'text': 'Network Monitor Agent'
-                    },
-                    'timestamp': datetime.utcnow().isoformat()
-                }]
-            }
+            buffer = getattr(self._batch, 'buffer', None)
+            if buffer is not None:
+                buffer['discord'].append((key, embed))
+                return
 
-            response = requests.post(
-                self.discord_webhook,
-                json=payload,
-                timeout=10
-            )
+            self._post_webhook('Discord', self.discord_webhook, {'embeds': [embed]}, (200, 204), [key])
 
-            if response.status_code not in [200, 204]:
-                self.logger.error(f"Failed to send Discord notification: {response.status_code}")
+        except Exception as e:
+            self.logger.error("Error sending Discord notification: %s", e)
+
+    @contextmanager
+    def batch(self):
+        """Collect this thread's webhook messages and send them as one post per channel on exit"""
+        if getattr(self._batch, 'buffer', None) is not None:
+            yield  # Already batching; the outer batch() sends
+            return
+
+        buffer = self._batch.buffer = {'slack': [], 'discord': []}
+        try:
+            yield
+        finally:
+            self._batch.buffer = None
+
+            if buffer['slack']:
+                keys, attachments = zip(*buffer['slack'])
+                self._post_webhook('Slack', self.slack_webhook, {'attachments': list(attachments)}, (200,), keys)
+
+            # Split embeds to stay within Discord's per-message embed count and text limits
+            chunk, chunk_keys, chunk_chars = [], [], 0
+            for key, embed in buffer['discord']:
+                embed_chars = len(embed['description']) + len(embed['footer']['text'])
+                if chunk and (len(chunk) == DISCORD_MAX_EMBEDS or chunk_chars + embed_chars > DISCORD_MAX_EMBED_CHARS):
+                    self._post_webhook('Discord', self.discord_webhook, {'embeds': chunk}, (200, 204), chunk_keys)
+                    chunk, chunk_keys, chunk_chars = [], [], 0
+                chunk.append(embed)
+                chunk_keys.append(key)
+                chunk_chars += embed_chars
+            if chunk:
+                self._post_webhook('Discord', self.discord_webhook, {'embeds': chunk}, (200, 204), chunk_keys)
+
+    def _post_webhook(self, channel: str, url: str, payload: Dict[str, Any], ok_statuses: tuple, keys=()):
+        """Queue a webhook POST on the sender pool so the caller doesn't wait on the network"""
+        try:
+            future = self._executor.submit(self._do_post, channel, url, payload, ok_statuses, keys)
+        except RuntimeError:
+            # Sender pool already shut down; deliver inline
+            self._do_post(channel, url, payload, ok_statuses, keys)
+            return
+
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard_pending)
+
+    def _discard_pending(self, future):
+        """Forget a finished webhook POST"""
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def _prepare_webhook(self, url: str, payload: Dict[str, Any]) -> requests.PreparedRequest:
+        """Build a webhook POST from a cached template, skipping per-call URL and header preparation"""
+        template = self._webhook_requests.get(url)
+        if template is None:
+            template = requests.Request('POST', url, headers={'Content-Type': 'application/json'}).prepare()
+            self._webhook_requests[url] = template
+
+        request = template.copy()
+        body = orjson.dumps(payload) if orjson is not None else json.dumps(payload).encode('utf-8')
+        request.prepare_body(body, None)
+        return request
+
+    def _do_post(self, channel: str, url: str, payload: Dict[str, Any], ok_statuses: tuple, keys=()):
+        """POST a webhook payload and log failures; failed messages are un-deduped so they retry"""
+        try:
+            response = self._http.send(self._prepare_webhook(url, payload), timeout=10)
+
+            if response.status_code not in ok_statuses:
+                self.logger.error("Failed to send %s notification: %s", channel, response.status_code)
+                self._forget_sent(keys)
 
         except Exception as e:
-            self.logger.error(f"Error sending Discord notification: {e}")
+            self.logger.error("Error sending %s notification: %s", channel, e)
+            self._forget_sent(keys)
 
     def notify_startup(self):
         """Notify that the agent has started"""
@@ -222,6 +389,15 @@ class Notifier:
         self.log_info(message)
         self._send_slack(message, color='warning')
         self._send_discord(message, color='orange')
+        self.close()
+
+    def close(self, timeout: float = 5):
+        """Wait briefly for queued webhooks, then close pooled connections"""
+        with self._pending_lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._http.close()
 
     def notify_daily_summary(self, summary_data: Dict[str, Any]):
         """Send daily health summary"""
@@ -234,21 +410,26 @@ class Notifier:
         systems_healthy = summary_data.get('systems_healthy', 0)
         systems_total = summary_data.get('systems_total', 0)
 
-        message = "📊 **Daily Homelab Health Summary**\n\n"
-        message += f"**Monitoring Cycles**: {total_checks}\n"
-        message += f"**Issues Detected**: {issues_found}\n"
-        message += f"**Actions Taken**: {actions_taken}\n"
-        message += f"**System Health**: {systems_healthy}/{systems_total} healthy\n\n"
-
         if issues_found == 0:
-            message += "✅ No issues detected today!"
+            verdict = "✅ No issues detected today!"
             color = 'green'
         elif actions_taken > 0:
-            message += f"🔧 {actions_taken} issue(s) automatically resolved"
+            verdict = f"🔧 {actions_taken} issue(s) automatically resolved"
             color = 'green'
         else:
-            message += "⚠️ Some issues require attention"
+            verdict = "⚠️ Some issues require attention"
             color = 'orange'
 
+        message = '\n'.join((
+            "📊 **Daily Homelab Health Summary**",
+            "",
+            f"**Monitoring Cycles**: {total_checks}",
+            f"**Issues Detected**: {issues_found}",
+            f"**Actions Taken**: {actions_taken}",
+            f"**System Health**: {systems_healthy}/{systems_total} healthy",
+            "",
+            verdict
+        ))
+
         self.log_info("Sending daily summary")
         self._send_discord(message, color=color)
@@ -1,19 +1,118 @@
 import subprocess
+import json
 import os
+import fnmatch
 import shutil
+import signal
 import requests
-from typing import Dict, Any, Tuple
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+from collections import OrderedDict
+
+try:
+    from pystemd.systemd1 import Manager as SystemdManager, Unit as SystemdUnit
+except ImportError:
+    SystemdManager = SystemdUnit = None
+
+# Seconds a process gets to exit after SIGTERM before it is sent SIGKILL
+KILL_GRACE_PERIOD = 2
+
+# Seconds the installed unit-file list is reused before listing again
+UNIT_CACHE_TTL = 30
+
+# Most (action, params) combinations kept in the attempt history
+ATTEMPT_HISTORY_MAX = 4096
+
+# Longest wait for a restarted service or remounted filesystem to settle before verifying it
+VERIFY_TIMEOUT = 5
+
+# systemd states a unit passes through while a start/stop job is still running
+TRANSITIONAL_STATES = ('activating', 'deactivating', 'reloading')
+
+# Seconds a restarted service must stay active to count as successfully restarted
+RESTART_SETTLE = 2
+
+# Longest wait for a queued systemd restart job to finish, matching the systemctl timeout
+RESTART_JOB_TIMEOUT = 30
 
 
 class RemediationActions:
     """Execute remediation actions to fix issues"""
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], ha_instances: List[Dict[str, Any]] = None):
         self.config = config
         self.max_attempts = config.get('max_attempts', 3)
         self.cooldown = config.get('cooldown', 300)
-        self.attempt_history = {}  # Track attempts per action
+        self.attempt_history = OrderedDict()  # Track attempts per action, least recently attempted first
+
+        # Installed service unit names, from one list-unit-files call
+        self._unit_cache = None
+        self._unit_cache_time = 0.0
+
+        # Already root: privileged commands run directly instead of through a sudo hop
+        self._is_root = os.geteuid() == 0
+
+        # systemd D-Bus manager for restarts; needs root, otherwise sudo systemctl is used
+        self._sd_manager = None
+        if SystemdManager is not None and self._is_root:
+            try:
+                self._sd_manager = SystemdManager()
+                self._sd_manager.load()
+            except Exception as e:
+                print(f"Warning: Could not connect to systemd over D-Bus: {e}")
+                self._sd_manager = None
+
+        # Resolve command paths once instead of searching PATH (or forking `which`) per action
+        self._paths = {
+            name: shutil.which(name)
+            for name in ('sudo', 'sh', 'docker', 'systemctl', 'journalctl', 'apt-get',
+                         'mount', 'umount')
+        }
+
+        # Home Assistant credentials by instance name, so issues don't carry tokens
+        self.ha_instances = {
+            instance.get('name', instance.get('url')): instance
+            for instance in (ha_instances or [])
+        }
+
+        # Keep-alive session for Home Assistant service calls; tokens are sent per call since
+        # instances differ, and proxy/netrc lookups are skipped for these LAN requests
+        self._ha = requests.Session()
+        self._ha.verify = False
+        self._ha.trust_env = False
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16)
+        self._ha.mount('http://', adapter)
+        self._ha.mount('https://', adapter)
+
+    def _wait_until(self, predicate, timeout: float = VERIFY_TIMEOUT, initial: float = 0.02) -> bool:
+        """Poll predicate with growing delays until it returns True or timeout seconds pass"""
+        deadline = time.monotonic() + timeout
+        delay = initial
+        while True:
+            if predicate():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 1.7, 0.2)
+
+    def _mount_accessible(self, mount_point: str) -> bool:
+        """Check that a path is mounted and its directory can be listed"""
+        try:
+            return os.path.ismount(mount_point) and os.listdir(mount_point) is not None
+        except OSError:
+            return False
+
+    def _privileged(self, cmd: List[str]) -> List[str]:
+        """Prefix a command with sudo unless the agent is already running as root"""
+        return cmd if self._is_root else [self._bin('sudo')] + cmd
+
+    def _bin(self, name: str) -> str:
+        """Get the resolved path for a command, or its bare name if it wasn't found at startup"""
+        return self._paths.get(name) or name
 
     def execute_action(self, action: Dict[str, Any]) -> Tuple[bool, str]:
         """Execute a remediation action"""
@@ -61,6 +160,75 @@ class RemediationActions:
         else:
             return False, f"Unknown action type: {action_type}"
 
+    def _unit_exists(self, service_name: str) -> bool:
+        """Check for an installed service unit against a unit-file list refreshed every UNIT_CACHE_TTL seconds"""
+        now = time.monotonic()
+        if self._unit_cache is None or now - self._unit_cache_time > UNIT_CACHE_TTL:
+            result = subprocess.run(
+                [self._bin('systemctl'), 'list-unit-files', '--type=service', '--no-legend', '--no-pager'],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            if result.returncode != 0:
+                return False  # Not cached, so the next call asks systemctl again
+            self._unit_cache = {line.split(None, 1)[0] for line in result.stdout.splitlines() if line.strip()}
+            self._unit_cache_time = now
+
+        return self._unit_name(service_name) in self._unit_cache
+
+    def _unit_name(self, service_name: str) -> str:
+        """Get the full unit name for a service"""
+        return service_name if service_name.endswith('.service') else f'{service_name}.service'
+
+    def _restart_unit(self, service_name: str) -> Tuple[bool, str]:
+        """Restart a service over D-Bus when possible, otherwise with sudo systemctl"""
+        if self._sd_manager is not None:
+            try:
+                job = self._sd_manager.Manager.RestartUnit(self._unit_name(service_name).encode(), b'replace')
+            except Exception:
+                job = None  # Fall back to systemctl, which reports the error in its output
+
+            if job is not None:
+                # RestartUnit only queues the job; wait for systemd to finish it, like systemctl does
+                if self._wait_until(lambda: not self._job_pending(job), RESTART_JOB_TIMEOUT):
+                    return True, ""
+                return False, f"restart job did not finish within {RESTART_JOB_TIMEOUT}s"
+
+        result = subprocess.run(
+            self._privileged([self._bin('systemctl'), 'restart', service_name]),
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        return result.returncode == 0, result.stderr
+
+    def _job_pending(self, job_path: bytes) -> bool:
+        """Check whether a systemd job is still queued or running"""
+        try:
+            self._sd_manager.Manager.GetJob(job_path)
+        except Exception:
+            return False  # NoSuchJob once systemd has finished it
+        return True
+
+    def _active_state(self, service_name: str) -> str:
+        """Get a service's ActiveState over D-Bus when possible, otherwise from systemctl is-active"""
+        if SystemdUnit is not None:
+            try:
+                unit = SystemdUnit(self._unit_name(service_name).encode())
+                unit.load()
+                return unit.Unit.ActiveState.decode()
+            except Exception:
+                pass
+
+        result = subprocess.run(
+            [self._bin('systemctl'), 'is-active', service_name],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        return result.stdout.strip()
+
     def restart_service(self, service_name: str) -> Tuple[bool, str]:
         """Restart a systemd service"""
         if not service_name:
@@ -68,40 +236,23 @@ class RemediationActions:
 
         try:
             # Check if service exists
-            check_result = subprocess.run(
-                ['systemctl', 'list-unit-files', f'{service_name}.service'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-
-            if service_name not in check_result.stdout:
+            if not self._unit_exists(service_name):
                 return False, f"Service {service_name} not found"
 
             # Restart the service
-            result = subprocess.run(
-                ['sudo', 'systemctl', 'restart', service_name],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-
-            if result.returncode == 0:
-                # Verify it's running
-                time.sleep(2)
-                verify = subprocess.run(
-                    ['systemctl', 'is-active', service_name],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-
-                if verify.stdout.strip() == 'active':
+            restarted, error = self._restart_unit(service_name)
+
+            if restarted:
+                # Verify it's running once startup has finished, and that it stays up for the
+                # settle window so a service that crashes right after starting isn't a success
+                self._wait_until(lambda: self._active_state(service_name) not in TRANSITIONAL_STATES)
+                if (self._active_state(service_name) == 'active'
+                        and not self._wait_until(lambda: self._active_state(service_name) != 'active', RESTART_SETTLE)):
                     return True, f"Successfully restarted {service_name}"
                 else:
                     return False, f"Service {service_name} restarted but not active"
             else:
-                return False, f"Failed to restart {service_name}: {result.stderr}"
+                return False, f"Failed to restart {service_name}: {error}"
 
         except subprocess.TimeoutExpired:
             return False, f"Timeout while restarting {service_name}"
@@ -114,7 +265,7 @@ class RemediationActions:
             if cache_type == 'system':
                 # Clear PageCache, dentries and inodes
                 result = subprocess.run(
-                    ['sudo', 'sh', '-c', 'sync; echo 3 > /proc/sys/vm/drop_caches'],
+                    self._privileged([self._bin('sh'), '-c', 'sync; echo 3 > /proc/sys/vm/drop_caches']),
                     capture_output=True,
                     text=True,
                     timeout=10
@@ -131,57 +282,43 @@ class RemediationActions:
         except Exception as e:
             return False, f"Error clearing cache: {str(e)}"
 
+    def _process_alive(self, pid: int) -> bool:
+        """Check whether a process is still running (exited-but-unreaped zombies count as gone)"""
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                state = f.read().rpartition(b')')[2].split()[0]
+        except (OSError, IndexError):
+            return False
+        return state not in (b'Z', b'X')
+
     def kill_process(self, pid: int) -> Tuple[bool, str]:
         """Kill a hung process"""
         if not pid:
             return False, "No PID provided"
 
         try:
-            # Check if process exists
-            check_result = subprocess.run(
-                ['ps', '-p', str(pid)],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            pid = int(pid)
 
-            if check_result.returncode != 0:
+            # Try graceful termination first (also tells us whether it exists)
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
                 return False, f"Process {pid} not found"
 
-            # Try graceful termination first
-            result = subprocess.run(
-                ['kill', str(pid)],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-
-            time.sleep(2)
-
-            # Check if process is still running
-            check_again = subprocess.run(
-                ['ps', '-p', str(pid)],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-
-            if check_again.returncode != 0:
+            # Wait for it to exit, checking often instead of sleeping the whole grace period
+            if self._wait_until(lambda: not self._process_alive(pid), KILL_GRACE_PERIOD):
                 return True, f"Successfully terminated process {pid}"
 
             # Force kill if still running
-            force_result = subprocess.run(
-                ['kill', '-9', str(pid)],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                return True, f"Successfully terminated process {pid}"
 
-            if force_result.returncode == 0:
-                return True, f"Force killed process {pid}"
-            else:
-                return False, f"Failed to kill process {pid}"
+            return True, f"Force killed process {pid}"
 
+        except PermissionError:
+            return False, f"Failed to kill process {pid}: permission denied"
         except Exception as e:
             return False, f"Error killing process {pid}: {str(e)}"
 
@@ -192,18 +329,12 @@ class RemediationActions:
 
         try:
             # Check if Docker is available
-            docker_check = subprocess.run(
-                ['which', 'docker'],
-                capture_output=True,
-                timeout=5
-            )
-
-            if docker_check.returncode != 0:
+            if self._paths['docker'] is None:
                 return False, "Docker not found on system"
 
             # Restart the container
             result = subprocess.run(
-                ['docker', 'restart', container_name],
+                [self._bin('docker'), 'restart', container_name],
                 capture_output=True,
                 text=True,
                 timeout=60
@@ -219,71 +350,107 @@ class RemediationActions:
         except Exception as e:
             return False, f"Error restarting container: {str(e)}"
 
+    def _purge_older_than(self, root: str, time_attr: str, max_age: int, pattern: str = None) -> int:
+        """Delete regular files under root whose time_attr is older than max_age seconds; returns bytes freed"""
+        freed = 0
+        cutoff = time.time() - max_age
+
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            freed += self._purge_older_than(entry.path, time_attr, max_age, pattern)
+                            continue
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        if pattern is not None and not fnmatch.fnmatch(entry.name, pattern):
+                            continue
+
+                        stat = entry.stat(follow_symlinks=False)
+                        if getattr(stat, time_attr) < cutoff:
+                            os.unlink(entry.path)
+                            freed += stat.st_size
+                    except OSError:
+                        continue  # Vanished, or not ours to delete
+        except OSError:
+            pass
+
+        return freed
+
     def clear_disk_space(self, partition: str = '/') -> Tuple[bool, str]:
         """Clear disk space by removing temporary files and old logs"""
         if not partition:
             partition = '/'
 
-        try:
-            freed_space = 0
+        # The cleanups touch separate directories and mostly wait on disk or subprocesses, so run them together
+        purges = []
+        commands = []
 
-            # Clear /tmp if it's on the same partition
-            if partition == '/' or partition.startswith('/tmp'):
-                tmp_files = ['/tmp/*', '/var/tmp/*']
-                for pattern in tmp_files:
-                    try:
-                        result = subprocess.run(
-                            ['sudo', 'find', pattern.split('/*')[0], '-type', 'f', '-atime', '+7', '-delete'],
-                            capture_output=True,
-                            text=True,
-                            timeout=30
-                        )
-                    except:
-                        pass
+        # Clear /tmp if it's on the same partition
+        if partition == '/' or partition.startswith('/tmp'):
+            for tmp_dir in ('/tmp', '/var/tmp'):
+                purges.append((tmp_dir, 'st_atime', 7 * 86400))
 
+        if partition == '/' or partition.startswith('/var'):
             # Clean old journal logs
-            if partition == '/' or partition.startswith('/var'):
-                try:
-                    result = subprocess.run(
-                        ['sudo', 'journalctl', '--vacuum-time=7d'],
-                        capture_output=True,
-                        text=True,
-                        timeout=30
-                    )
-                except:
-                    pass
+            commands.append([self._bin('journalctl'), '--vacuum-time=7d'])
 
             # Clean apt cache on Debian/Ubuntu systems
-            if partition == '/' or partition.startswith('/var'):
-                if os.path.exists('/usr/bin/apt-get'):
-                    try:
-                        subprocess.run(
-                            ['sudo', 'apt-get', 'clean'],
-                            capture_output=True,
-                            timeout=30
-                        )
-                    except:
-                        pass
+            if self._paths['apt-get'] is not None:
+                commands.append([self._bin('apt-get'), 'clean'])
 
             # Clean old log files
-            if partition == '/' or partition.startswith('/var'):
-                try:
-                    subprocess.run(
-                        ['sudo', 'find', '/var/log', '-type', 'f', '-name', '*.log.*', '-mtime', '+30', '-delete'],
-                        capture_output=True,
-                        timeout=60
-                    )
-                except:
-                    pass
-
-            return True, f"Disk cleanup completed for {partition}"
+            purges.append(('/var/log', 'st_mtime', 30 * 86400, '*.log.*'))
+
+        try:
+            freed_space = 0
+            errors = []
+
+            if purges or commands:
+                with ThreadPoolExecutor(max_workers=len(purges) + len(commands), thread_name_prefix='cleanup') as executor:
+                    purge_futures = [executor.submit(self._purge_older_than, *args) for args in purges]
+                    command_futures = [executor.submit(self._run_cleanup_command, cmd) for cmd in commands]
+
+                    for future in as_completed(purge_futures):
+                        freed_space += future.result()
+                    for future in as_completed(command_futures):
+                        error = future.result()
+                        if error:
+                            errors.append(error)
+
+            message = f"Disk cleanup completed for {partition} ({freed_space // (1024**2)}MB freed from old files)"
+            if errors:
+                message += f"; {'; '.join(errors)}"
+            return True, message
 
         except Exception as e:
             return False, f"Error clearing disk space: {str(e)}"
 
+    def _run_cleanup_command(self, cmd: List[str]) -> str:
+        """Run a best-effort privileged cleanup command; returns an error description, or '' on success"""
+        name = os.path.basename(cmd[0])
+        try:
+            result = subprocess.run(self._privileged(cmd), capture_output=True, text=True, timeout=30)
+        except subprocess.TimeoutExpired:
+            return f"{name} timed out"
+        except OSError as e:
+            return f"{name} failed: {e}"
+
+        if result.returncode != 0:
+            return f"{name} failed: {result.stderr.strip() or result.returncode}"
+        return ""
+
+    def _attempt_key(self, action_type: str, params: Dict[str, Any]) -> tuple:
+        """Build an attempt-history key that doesn't depend on param ordering"""
+        return (action_type, tuple(sorted(
+            (name, json.dumps(value, sort_keys=True, default=str) if isinstance(value, (dict, list)) else repr(value))
+            for name, value in params.items()
+        )))
+
     def _check_cooldown(self, action_type: str, params: Dict[str, Any]) -> bool:
         """Check if action is in cooldown period"""
-        key = f"{action_type}_{str(params)}"
+        key = self._attempt_key(action_type, params)
 
         if key in self.attempt_history:
             last_attempt, count = self.attempt_history[key]
@@ -306,7 +473,7 @@ class RemediationActions:
         try:
             # Try remounting
             result = subprocess.run(
-                ['sudo', 'mount', '-o', 'remount', mount_point],
+                self._privileged([self._bin('mount'), '-o', 'remount', mount_point]),
                 capture_output=True,
                 text=True,
                 timeout=30
@@ -314,11 +481,9 @@ class RemediationActions:
 
             if result.returncode == 0:
                 # Verify mount is accessible
-                time.sleep(2)
-                try:
-                    os.listdir(mount_point)
+                if self._wait_until(lambda: self._mount_accessible(mount_point)):
                     return True, f"Successfully remounted {mount_point}"
-                except:
+                else:
                     return False, f"Remount command succeeded but {mount_point} still not accessible"
             else:
                 return False, f"Failed to remount {mount_point}: {result.stderr}"
@@ -344,16 +509,17 @@ class RemediationActions:
         try:
             # First, try to unmount (force if needed)
             unmount_result = subprocess.run(
-                ['sudo', 'umount', '-f', mount_point],
+                self._privileged([self._bin('umount'), '-f', mount_point]),
                 capture_output=True,
                 text=True,
                 timeout=30
             )
 
-            time.sleep(2)
+            # Give a lazy/forced unmount a moment to detach
+            self._wait_until(lambda: not os.path.ismount(mount_point), 2)
 
             # Now mount it again
-            mount_cmd = ['sudo', 'mount']
+            mount_cmd = self._privileged([self._bin('mount')])
             if mount_type != 'auto':
                 mount_cmd.extend(['-t', mount_type])
             if mount_options != 'defaults':
@@ -369,11 +535,9 @@ class RemediationActions:
 
             if mount_result.returncode == 0:
                 # Verify mount is accessible
-                time.sleep(2)
-                try:
-                    os.listdir(mount_point)
+                if self._wait_until(lambda: self._mount_accessible(mount_point)):
                     return True, f"Successfully unmounted and remounted {mount_point}"
-                except:
+                else:
                     return False, f"Mount command succeeded but {mount_point} still not accessible"
             else:
                 return False, f"Failed to mount {mount_point}: {mount_result.stderr}"
@@ -385,9 +549,18 @@ class RemediationActions:
 
     def _record_attempt(self, action_type: str, params: Dict[str, Any]):
         """Record an action attempt"""
-        key = f"{action_type}_{str(params)}"
+        key = self._attempt_key(action_type, params)
         current_time = time.time()
 
+        # Forget actions not attempted for a long time; entries are in attempt order, so only
+        # the stale ones at the front are visited
+        stale_before = current_time - 10 * self.cooldown
+        while self.attempt_history:
+            oldest_key = next(iter(self.attempt_history))
+            if self.attempt_history[oldest_key][0] >= stale_before:
+                break
+            del self.attempt_history[oldest_key]
+
         if key in self.attempt_history:
             last_attempt, count = self.attempt_history[key]
             time_since = current_time - last_attempt
@@ -400,15 +573,24 @@ class RemediationActions:
         else:
             self.attempt_history[key] = (current_time, 1)
 
+        self.attempt_history.move_to_end(key)
+        while len(self.attempt_history) > ATTEMPT_HISTORY_MAX:
+            self.attempt_history.popitem(last=False)
+
+    def _resolve_ha_instance(self, params: Dict[str, Any]) -> Tuple[str, str]:
+        """Get (url, token) for a Home Assistant action from its configured instance"""
+        # Action params come from the AI; a url/token there must never redirect the configured token
+        instance = self.ha_instances.get(params.get('instance'), {})
+        return instance.get('url'), instance.get('token')
+
     def enable_automation(self, params: Dict[str, Any]) -> Tuple[bool, str]:
         """Re-enable a disabled Home Assistant automation"""
         entity_id = params.get('entity_id')
-        url = params.get('url')
-        token = params.get('token')
+        url, token = self._resolve_ha_instance(params)
         friendly_name = params.get('friendly_name', entity_id)
 
         if not all([entity_id, url, token]):
-            return False, "Missing required parameters (entity_id, url, token)"
+            return False, "Missing required parameters (entity_id, instance)"
 
         try:
             # Call Home Assistant service to turn on automation
@@ -419,7 +601,7 @@ class RemediationActions:
             }
             data = {'entity_id': entity_id}
 
-            response = requests.post(service_url, headers=headers, json=data, verify=False, timeout=10)
+            response = self._ha.post(service_url, headers=headers, json=data, timeout=10)
 
             if response.status_code == 200:
                 return True, f"Successfully enabled automation '{friendly_name}'"
@@ -432,12 +614,11 @@ class RemediationActions:
     def reload_integration(self, params: Dict[str, Any]) -> Tuple[bool, str]:
         """Reload a failed Home Assistant integration"""
         integration_id = params.get('integration_id')
-        url = params.get('url')
-        token = params.get('token')
+        url, token = self._resolve_ha_instance(params)
         title = params.get('title', integration_id)
 
         if not all([integration_id, url, token]):
-            return False, "Missing required parameters (integration_id, url, token)"
+            return False, "Missing required parameters (integration_id, instance)"
 
         try:
             # Call Home Assistant service to reload config entry
@@ -447,7 +628,7 @@ class RemediationActions:
                 'Content-Type': 'application/json'
             }
 
-            response = requests.post(service_url, headers=headers, verify=False, timeout=10)
+            response = self._ha.post(service_url, headers=headers, timeout=10)
 
             if response.status_code in [200, 204]:
                 return True, f"Successfully reloaded integration '{title}'"